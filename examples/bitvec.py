@@ -0,0 +1,13 @@
+from pyexsmt.args import *
+
+@symbolic(x=BitVec(8))
+def bitvec(x):
+    # x is an 8-bit two's complement integer
+    if x + 1 < x:
+        return "OVERFLOW"
+    if (x & 0x0f) == 0x0f and (x >> 4) == -2:
+        return "NIBBLES"
+    return "OTHER"
+
+def expected_result_set():
+    return ["OVERFLOW", "NIBBLES", "OTHER"]
@@ -0,0 +1,25 @@
+# Copyright: see copyright.txt
+
+from pyexsmt.args import *
+
+# Each call to clamp branches three ways: 27 paths through compose, or a
+# handful when clamp is summarized once and its summary reused
+
+@summarize
+def clamp(x):
+    if x < 0:
+        return 0
+    if x > 100:
+        return 100
+    return x
+
+def compose(a, b, c):
+    total = clamp(a) + clamp(b) + clamp(c)
+    if total == 300:
+        return "FULL"
+    if total == 0:
+        return "EMPTY"
+    return "PARTIAL"
+
+def expected_result_set():
+    return ["FULL", "EMPTY", "PARTIAL"]
@@ -0,0 +1,15 @@
+# Copyright: see copyright.txt
+
+# Compound conditions: one branch each with --flatten-conditions
+
+def conditions(a, b, c):
+    if a > 0 and b > 0 and c > 0:
+        return 1
+    if not (a < 0 or b < 0):
+        return 2
+    if b != 0 and c > b:
+        return 3
+    return 0
+
+def expected_result_set():
+    return [0, 1, 2, 3]
@@ -0,0 +1,23 @@
+# Copyright: see copyright.txt
+
+# Independent ifs that only assign: 16 paths, or three with --merge-states
+
+def merge(in1, in2, in3, in4):
+    flags = 0
+    if in1 > 0:
+        flags = flags + 1
+    if in2 > 0:
+        flags += 2
+    else:
+        flags -= 2
+    if in3 > 0:
+        flags += 4
+    sign = 1
+    if in4 < 0:
+        sign = -1
+    if flags == 7 and sign == -1:
+        return 1
+    return 0
+
+def expected_result_set():
+    return [0, 1]
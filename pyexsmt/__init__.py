@@ -4,6 +4,8 @@ import sys
 
 from pyexsmt.symbolic_types import SymbolicObject
 from pyexsmt.symbolic_types.symbolic_int import SymbolicInteger
+from pyexsmt.symbolic_types.symbolic_bitvec import SymbolicBitVec
+from pyexsmt.args import BitVec
 from pyexsmt.symbolic_types.symbolic_object import to_pysmt
 
 from pysmt.shortcuts import *
@@ -37,6 +39,17 @@ def get_concr_value(variable):
     else:
         return variable
 
+def set_concr_values(variables):
+    '''
+    variables : [(U SymbolicObject PythonPrimitive)], the inputs
+    Take the value of each symbolic input from the current model, once
+    per execution; everything computed from them carries its own value.
+    '''
+    for v in variables:
+        if isinstance(v, SymbolicObject):
+            v.concr = None
+            v.concr = v.get_concr_value()
+
 def parse_types(type_list):
     '''
     take a list of two strings, type_list.
@@ -56,6 +69,18 @@ def parse_types(type_list):
         \nSupported types are:%s", type_list, list(TYPES.keys()))
         sys.exit(-1)
 
+def parse_int_encoding(encoding):
+    '''
+    encoding : "int" for unbounded integers, "bv<width>" for bit-vectors
+    returns None or the BitVec to encode integer inputs with
+    '''
+    if encoding == "int":
+        return None
+    match = re.match(r"bv(\d+)$", encoding)
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError("Unsupported integer encoding: %s" % encoding)
+    return BitVec(int(match.group(1)))
+
 def uninterp_func_pair(definition, module):
     '''
     definition : [name : String, return_type : String, argument_types : String]
@@ -92,6 +117,8 @@ def get_symbolic_from_expr(expr):
     '''
     if expr.get_type().is_int_type():
         return SymbolicInteger(expr)
+    elif expr.get_type().is_bv_type():
+        return SymbolicBitVec(expr)
     elif expr.get_type().is_bool_type():
         return SymbolicObject(expr)
     else:
@@ -1,3 +1,5 @@
+import functools
+
 def symbolic(**arg_types):
     def decorator(f):
         f.symbolic_args = arg_types
@@ -9,3 +11,24 @@ def concrete(**arg_types):
         f.concrete_args = arg_types
         return f
     return decorator
+
+def summarize(f):
+    # calls with symbolic arguments are answered from a summary of f,
+    # see pyexsmt.summary
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        if len(kwargs) > 0:
+            # summaries are keyed by the positional arguments only
+            return f(*args, **kwargs)
+        from pyexsmt import summary
+        return summary.call(f, args)
+    return wrapper
+
+class BitVec:
+    """Type of a symbolic argument encoded as a width-bit integer:
+       @symbolic(x=BitVec(64))"""
+    def __init__(self, width):
+        self.width = width
+
+    def __repr__(self):
+        return "BitVec(%d)" % self.width
@@ -0,0 +1,161 @@
+# Copyright: see copyright.txt
+
+from collections import Counter, OrderedDict
+import heapq
+import itertools
+import logging
+
+from pysmt.exceptions import PysmtException
+
+from pysmt.solvers.eager import EagerModel
+
+# stored models tried on a query before giving up and calling the solver
+MAX_CANDIDATES = 4
+
+class CachedModel:
+    """A fixed assignment to the symbolic inputs. Stands in for the solver
+       (SymbolicObject.SOLVER) when a query is answered without calling it."""
+    def __init__(self, assignment):
+        '''
+        assignment : {Symbol : constant}
+        '''
+        self.assignment = assignment
+        self.model = EagerModel(assignment)
+        self.last_result = True
+
+    def get_value(self, expr):
+        return self.model.get_value(expr)
+
+    def get_py_value(self, expr):
+        return self.model.get_py_value(expr)
+
+    def satisfies(self, formulas):
+        try:
+            return all(self.model.get_py_value(f) is True for f in formulas)
+        except PysmtException:
+            return False
+
+class QueryCache:
+    """LRU cache from the set of formulas asserted by a query to its outcome.
+       The bound is a number of entries, not of bytes: an entry is the
+       frozenset of the query's formulas, which pySMT shares with the
+       constraint tree, and the model's values for the inputs."""
+    def __init__(self, max_entries=4096):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, formulas):
+        '''
+        formulas : [FNode], the conjunction that was queried
+        returns (sat, model) if it was seen before, None otherwise
+        model is a CachedModel, or None if no model was stored
+        '''
+        key = frozenset(formulas)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        logging.debug("QUERY CACHE HIT: %s", entry)
+        return entry
+
+    def store(self, formulas, sat, model=None):
+        key = frozenset(formulas)
+        self.entries[key] = (sat, model)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        return "%d hits, %d misses, %d evictions" % (self.hits, self.misses, self.evictions)
+
+class CounterexampleCache:
+    """Remembers which sets of formulas are satisfied by which models, and
+       which are unsat, indexed by formula. A query is answered from an unsat
+       subset, a model of a superset, or else by evaluating the models of
+       subsets and of a few overlapping sets before anyone calls the solver."""
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        # entry id -> (frozenset of formulas, CachedModel or None if unsat)
+        self.entries = OrderedDict()
+        # formula -> ids of the entries containing it
+        self.index = {}
+        self.ids = itertools.count()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, formulas):
+        '''
+        formulas : [FNode], the conjunction to satisfy
+        returns (sat, model) if the cache can answer, None otherwise
+        '''
+        key = frozenset(formulas)
+        overlap = Counter()
+        for f in key:
+            overlap.update(self.index.get(f, ()))
+
+        subsets = []
+        for eid, count in overlap.items():
+            stored, model = self.entries[eid]
+            if count == len(stored):
+                if model is None:
+                    return self._hit(key, False, None)
+                subsets.append(eid)
+            if count == len(key) and model is not None:
+                return self._hit(key, True, model)
+
+        # the models most likely to work are those of the largest subsets of
+        # the query, then those agreeing with it on the most formulas; only a
+        # few are tried, or each miss would cost as much as the cache is large
+        candidates = heapq.nlargest(MAX_CANDIDATES, subsets, key=lambda eid: overlap[eid])
+        if len(candidates) < MAX_CANDIDATES:
+            tried = set(subsets)
+            candidates += heapq.nlargest(MAX_CANDIDATES - len(candidates), \
+                                         (eid for eid in overlap if eid not in tried and self.entries[eid][1] is not None), \
+                                         key=lambda eid: overlap[eid])
+        for eid in candidates:
+            stored, model = self.entries[eid]
+            # model is known to satisfy the formulas stored with it
+            if model.satisfies(key - stored):
+                self.store(key, model)
+                return self._hit(key, True, model)
+
+        self.misses += 1
+        return None
+
+    def store(self, formulas, model):
+        '''
+        model : CachedModel satisfying formulas, or None if they are unsat
+        '''
+        key = frozenset(formulas)
+        eid = next(self.ids)
+        self.entries[eid] = (key, model)
+        for f in key:
+            self.index.setdefault(f, set()).add(eid)
+        while len(self.entries) > self.max_entries:
+            old, (stored, _) = self.entries.popitem(last=False)
+            for f in stored:
+                self.index[f].discard(old)
+                if len(self.index[f]) == 0:
+                    del self.index[f]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        return "%d hits, %d misses" % (self.hits, self.misses)
+
+    # private
+
+    def _hit(self, key, sat, model):
+        self.hits += 1
+        logging.debug("COUNTEREXAMPLE CACHE HIT (%s): %s", sat, key)
+        return (sat, model)
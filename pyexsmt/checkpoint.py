@@ -0,0 +1,133 @@
+# Copyright: see copyright.txt
+
+import json
+import logging
+import os
+import shutil
+import time
+
+from pyexsmt import get_symbolic_from_expr
+from pyexsmt import smtlib
+from pyexsmt.constraint import Constraint
+from pyexsmt.symbolic_types import SymbolicObject
+
+class Checkpoint:
+    """Append-only journal of an exploration, one JSON record per line:
+       every constraint added to the tree, every constraint taken off the
+       queue and every execution. Records are buffered and flushed at most
+       every interval seconds, so writing never rescans the tree."""
+    def __init__(self, filename, root, interval=5):
+        fresh = not os.path.exists(filename) or os.path.getsize(filename) == 0
+        if not fresh:
+            with open(filename, "rb") as journal:
+                journal.seek(-1, os.SEEK_END)
+                truncated = journal.read(1) != b"\n"
+        self.file = open(filename, "a")
+        if not fresh and truncated:
+            # don't glue new records to a line cut short by a crash
+            self.file.write("\n")
+        self.buffer = []
+        self.interval = interval
+        self.last_flush = time.time()
+        if fresh:
+            self._write({"root": root.id})
+
+    def node(self, constraint):
+        pred = constraint.predicate
+        self._write({"node": constraint.id, "parent": constraint.parent.id, \
+                     "pred": smtlib.dumps([pred.symtype.expr]), "result": pred.result})
+
+    def done(self, constraint):
+        self._write({"done": constraint.id, "infeasible": constraint.infeasible})
+
+    def execution(self, constraint, inputs, ret, value):
+        record = {"run": constraint.id, "inputs": inputs}
+        if isinstance(ret, SymbolicObject):
+            record["effect"] = smtlib.dumps([ret.expr])
+        try:
+            json.dumps(value)
+            record["value"] = value
+        except TypeError:
+            logging.warning("Can't checkpoint return value %s, storing its repr", repr(value))
+            record["value"] = repr(value)
+        self._write(record)
+
+    def flush(self, force=False):
+        if not force and time.time() - self.last_flush < self.interval:
+            return
+        self.file.write("".join(self.buffer))
+        self.file.flush()
+        self.buffer = []
+        self.last_flush = time.time()
+
+    def close(self):
+        self.flush(True)
+        self.file.close()
+
+    # private
+
+    def _write(self, record):
+        self.buffer.append(json.dumps(record) + "\n")
+
+def restore(filename, engine):
+    '''
+    Replay the journal in filename into engine: rebuild its tree, queue
+    the constraints that were never taken off the queue and record the
+    inputs and effects of the executions. Constraints keep their journaled
+    ids, so the journal can be appended to and restored again.
+    '''
+    path = engine.path
+    result = engine.result
+    constraints = {}
+    pending = []
+    with open(filename) as journal:
+        for line in journal:
+            line = line.strip()
+            if line == "":
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # the last line may be cut short if we were killed mid-write
+                logging.warning("Ignoring truncated checkpoint record: %s", line)
+                continue
+
+            if "root" in record:
+                path.root_constraint.id = record["root"]
+                constraints[record["root"]] = path.root_constraint
+            elif "node" in record:
+                parent = constraints[record["parent"]]
+                expr = smtlib.loads(record["pred"])[0]
+                c = parent.add_child(path.predicate(SymbolicObject(expr), record["result"]))
+                c.id = record["node"]
+                path.num_constraints += 1
+                constraints[record["node"]] = c
+                pending.append(c)
+            elif "done" in record:
+                c = constraints[record["done"]]
+                c.processed = True
+                c.infeasible = record["infeasible"]
+            elif "run" in record:
+                path.current_constraint = constraints[record["run"]]
+                result.record_input_values([tuple(i) for i in record["inputs"]])
+                if "effect" in record:
+                    ret = get_symbolic_from_expr(smtlib.loads(record["effect"])[0])
+                else:
+                    ret = record["value"]
+                result.record_effect(ret, record["value"])
+
+    Constraint.cnt = max([Constraint.cnt] + [i + 1 for i in constraints])
+    for c in pending:
+        if len(c.parent.children) == 2:
+            # both outcomes of this branch were reached
+            c.processed = True
+        if not c.processed:
+            engine.constraints_to_solve.add(c)
+    path.current_constraint = path.root_constraint
+    logging.info("Restored %d constraints and %d executions from %s", \
+                 len(pending), result.num_executions, filename)
+
+def copy(source, destination):
+    # start a new journal from the state recorded in another one
+    if os.path.abspath(source) != os.path.abspath(destination):
+        shutil.copyfile(source, destination)
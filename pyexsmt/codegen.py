@@ -0,0 +1,413 @@
+# Copyright: see copyright.txt
+
+import ast
+import keyword
+
+import pysmt.operators as op
+from pysmt.walkers import DagWalker, handles
+
+from pyexsmt.symbolic_types.symbolic_bitvec import to_signed
+
+from pysmt.shortcuts import *
+
+# Turns a summary (Result.to_summary) into the source of a Python module
+# defining one function of the inputs, so that it can be evaluated on many
+# inputs without going through pySMT for each of them.
+#
+# The plain version branches like the summary does: the Ite at the top of
+# the summary become if statements, and each call only evaluates the
+# conditions along one path. The vectorized version takes NumPy arrays (or
+# scalars, broadcast against them) and evaluates every branch on all the
+# inputs at once, with numpy.where choosing between them; it returns a
+# masked array, masked where the summary is Unknown.
+#
+# Bit-vectors are handled as the signed Python ints the explored function
+# sees, wrapped to their width after every operation; the vectorized
+# version stores them in int64 arrays, so it is limited to 64 bits. Integers
+# are unbounded in the plain version and int64 in the vectorized one.
+
+# if statements nested deeper than this go to a function of their own
+MAX_NESTING = 32
+
+_PYTHON_HELPERS = '''
+def _wrap(v, width):
+    return ((v + (1 << (width - 1))) & ((1 << width) - 1)) - (1 << (width - 1))
+
+def _sdiv(a, b, width):
+    if b == 0:
+        return -1 if a >= 0 else 1
+    q = abs(a) // abs(b)
+    return _wrap(q if (a < 0) == (b < 0) else -q, width)
+
+def _srem(a, b):
+    if b == 0:
+        return a
+    r = abs(a) % abs(b)
+    return -r if a < 0 else r
+
+def _shl(a, b, width):
+    # b < 0 stands for a shift by 2**(width-1) or more
+    return 0 if b < 0 or b >= width else _wrap(a << b, width)
+
+def _ashr(a, b, width):
+    return a >> (width - 1 if b < 0 or b >= width else b)
+'''
+
+_NUMPY_HELPERS = '''
+import numpy as np
+
+def _wrap(v, width):
+    if width == 64:
+        # int64 arithmetic already wraps
+        return v
+    return ((v + (1 << (width - 1))) & ((1 << width) - 1)) - (1 << (width - 1))
+
+def _sdiv(a, b, width):
+    q = np.abs(a) // np.where(b == 0, 1, np.abs(b))
+    q = _wrap(np.where((a < 0) == (b < 0), q, -q), width)
+    return np.where(b == 0, np.where(a >= 0, -1, 1), q)
+
+def _srem(a, b):
+    r = np.abs(a) % np.where(b == 0, 1, np.abs(b))
+    return np.where(b == 0, a, np.where(a < 0, -r, r))
+
+def _shl(a, b, width):
+    out = (b < 0) | (b >= width)
+    return np.where(out, 0, _wrap(np.left_shift(a, np.where(out, 0, b)), width))
+
+def _ashr(a, b, width):
+    return np.right_shift(a, np.where((b < 0) | (b >= width), width - 1, b))
+'''
+
+def source(summary, params=(), name="summary", vectorized=False, unknown=Symbol('Unknown', INT)):
+    '''
+    summary : FNode, as returned by Result.to_summary
+    params : names of the arguments of the function, in order; the other
+    free symbols of summary are added after them, sorted by name
+    name : name of the function
+    vectorized : generate the NumPy version
+    unknown : the symbol summary uses for the paths that weren't explored
+    returns the source of a module defining the function
+    '''
+    names = _Names(summary, params, unknown)
+    if vectorized:
+        lines = _numpy_function(summary, name, names, unknown)
+        helpers = _NUMPY_HELPERS
+    else:
+        lines = _python_function(summary, name, names, unknown)
+        helpers = _PYTHON_HELPERS
+    return "# Generated by pyexsmt\n" + helpers + "\n" + "\n".join(lines) + "\n"
+
+def evaluator(summary, params=(), vectorized=False, unknown=Symbol('Unknown', INT)):
+    '''
+    returns the function source generates, compiled; see source
+    '''
+    namespace = {}
+    exec(compile(source(summary, params, "summary", vectorized, unknown), "<summary>", "exec"), namespace)
+    return namespace["summary"]
+
+class _Names:
+    """The Python names of the free symbols of a summary. A symbol whose
+       name is a Python literal stands for a constant (see match_smt_type)."""
+    def __init__(self, summary, params, unknown):
+        symbols = dict((s.symbol_name(), s) for s in summary.get_free_variables())
+        self.constants = {}
+        for s in symbols.values():
+            try:
+                self.constants[s] = repr(ast.literal_eval(s.symbol_name()))
+            except (ValueError, SyntaxError):
+                if not s.symbol_name().isidentifier():
+                    # a value of another type than unknown, see match_smt_type
+                    raise NotImplementedError("Can't compile %s, it doesn't have the type of %s" \
+                                              % (s.symbol_name(), unknown))
+        order = list(params) + sorted(n for n in symbols if n not in params)
+        self.arguments = []
+        self.variables = {}
+        for n in order:
+            s = symbols.get(n)
+            if s is unknown or s in self.constants:
+                continue
+            # generated names start with _
+            if not n.isidentifier() or keyword.iskeyword(n) or n.startswith("_"):
+                n = "_a%d" % len(self.arguments)
+            self.arguments.append(n)
+            if s is not None:
+                self.variables[s] = n
+        self.unknown = unknown.symbol_name() if unknown.symbol_name().isidentifier() else "_unknown"
+        self.variables[unknown] = self.unknown
+
+    def __getitem__(self, symbol):
+        if symbol in self.constants:
+            return self.constants[symbol]
+        return self.variables[symbol]
+
+class _PythonExpr(DagWalker):
+    """Prints a pySMT term as a Python expression."""
+    def __init__(self, names):
+        DagWalker.__init__(self)
+        self.names = names
+
+    def walk_error(self, formula, **kwargs):
+        raise NotImplementedError("Can't compile %s" % op.op_to_str(formula.node_type()))
+
+    def walk_symbol(self, formula, args, **kwargs):
+        return self.names[formula]
+
+    def walk_function(self, formula, args, **kwargs):
+        return "%s(%s)" % (self.names[formula.function_name()], ", ".join(args))
+
+    def walk_bool_constant(self, formula, args, **kwargs):
+        return repr(formula.constant_value())
+
+    def walk_int_constant(self, formula, args, **kwargs):
+        return _number(formula.constant_value())
+
+    def walk_bv_constant(self, formula, args, **kwargs):
+        return _number(to_signed(formula.constant_value(), formula.bv_width()))
+
+    def walk_and(self, formula, args, **kwargs):
+        return "(%s)" % " and ".join(args)
+
+    def walk_or(self, formula, args, **kwargs):
+        return "(%s)" % " or ".join(args)
+
+    def walk_not(self, formula, args, **kwargs):
+        return "(not %s)" % args[0]
+
+    def walk_implies(self, formula, args, **kwargs):
+        return "(not %s or %s)" % tuple(args)
+
+    def walk_iff(self, formula, args, **kwargs):
+        return "(%s == %s)" % tuple(args)
+
+    def walk_ite(self, formula, args, **kwargs):
+        return "(%s if %s else %s)" % (args[1], args[0], args[2])
+
+    def walk_equals(self, formula, args, **kwargs):
+        return "(%s == %s)" % tuple(args)
+
+    def walk_le(self, formula, args, **kwargs):
+        return "(%s <= %s)" % tuple(args)
+
+    def walk_lt(self, formula, args, **kwargs):
+        return "(%s < %s)" % tuple(args)
+
+    def walk_plus(self, formula, args, **kwargs):
+        return "(%s)" % " + ".join(args)
+
+    def walk_minus(self, formula, args, **kwargs):
+        return "(%s - %s)" % tuple(args)
+
+    def walk_times(self, formula, args, **kwargs):
+        return "(%s)" % " * ".join(args)
+
+    def walk_bv_add(self, formula, args, **kwargs):
+        return "_wrap(%s + %s, %d)" % (args[0], args[1], formula.bv_width())
+
+    def walk_bv_sub(self, formula, args, **kwargs):
+        return "_wrap(%s - %s, %d)" % (args[0], args[1], formula.bv_width())
+
+    def walk_bv_mul(self, formula, args, **kwargs):
+        return "_wrap(%s * %s, %d)" % (args[0], args[1], formula.bv_width())
+
+    def walk_bv_neg(self, formula, args, **kwargs):
+        return "_wrap(-%s, %d)" % (args[0], formula.bv_width())
+
+    def walk_bv_sdiv(self, formula, args, **kwargs):
+        return "_sdiv(%s, %s, %d)" % (args[0], args[1], formula.bv_width())
+
+    def walk_bv_srem(self, formula, args, **kwargs):
+        return "_srem(%s, %s)" % tuple(args)
+
+    def walk_bv_lshl(self, formula, args, **kwargs):
+        return "_shl(%s, %s, %d)" % (args[0], args[1], formula.bv_width())
+
+    def walk_bv_ashr(self, formula, args, **kwargs):
+        return "_ashr(%s, %s, %d)" % (args[0], args[1], formula.bv_width())
+
+    # the signed reading of the operands is in range, so these don't wrap
+
+    def walk_bv_and(self, formula, args, **kwargs):
+        return "(%s & %s)" % tuple(args)
+
+    def walk_bv_or(self, formula, args, **kwargs):
+        return "(%s | %s)" % tuple(args)
+
+    def walk_bv_xor(self, formula, args, **kwargs):
+        return "(%s ^ %s)" % tuple(args)
+
+    def walk_bv_not(self, formula, args, **kwargs):
+        return "(~%s)" % args[0]
+
+    def walk_bv_slt(self, formula, args, **kwargs):
+        return "(%s < %s)" % tuple(args)
+
+    def walk_bv_sle(self, formula, args, **kwargs):
+        return "(%s <= %s)" % tuple(args)
+
+class _NumpyExpr(_PythonExpr):
+    """Prints a pySMT term as a NumPy expression. Every subterm used more
+       than once is computed once, into a variable of its own: lines holds
+       the assignments, in the order they must run."""
+    def __init__(self, names, terms):
+        _PythonExpr.__init__(self, names)
+        self.shared = _shared(*terms)
+        self.lines = []
+
+    def walk_error(self, formula, **kwargs):
+        raise NotImplementedError("Can't vectorize %s" % op.op_to_str(formula.node_type()))
+
+    def walk_bv_constant(self, formula, args, **kwargs):
+        if formula.bv_width() > 64:
+            raise NotImplementedError("Can't vectorize %d bit integers" % formula.bv_width())
+        return _PythonExpr.walk_bv_constant(self, formula, args)
+
+    def walk_symbol(self, formula, args, **kwargs):
+        text = self.names[formula]
+        if formula in self.names.constants and not isinstance(ast.literal_eval(text), (int, float)):
+            # a value numpy can't store with the numbers, such as a string
+            return "np.array(%s, dtype=object)" % text
+        return text
+
+    def walk_and(self, formula, args, **kwargs):
+        return "np.logical_and.reduce((%s,))" % ", ".join(args)
+
+    def walk_or(self, formula, args, **kwargs):
+        return "np.logical_or.reduce((%s,))" % ", ".join(args)
+
+    def walk_not(self, formula, args, **kwargs):
+        return "np.logical_not(%s)" % args[0]
+
+    def walk_implies(self, formula, args, **kwargs):
+        return "np.logical_or(np.logical_not(%s), %s)" % tuple(args)
+
+    def walk_ite(self, formula, args, **kwargs):
+        return "np.where(%s, %s, %s)" % tuple(args)
+
+    def _compute_node_result(self, formula, **kwargs):
+        key = self._get_key(formula, **kwargs)
+        if key in self.memoization:
+            return
+        DagWalker._compute_node_result(self, formula, **kwargs)
+        if formula in self.shared and not formula.is_symbol() and not formula.is_constant():
+            var = "_t%d" % len(self.lines)
+            self.lines.append("%s = %s" % (var, self.memoization[key]))
+            self.memoization[key] = var
+
+class _Defined(DagWalker):
+    """Builds the condition under which a term doesn't depend on unknown."""
+    def __init__(self, unknown):
+        DagWalker.__init__(self)
+        self.unknown = unknown
+
+    @handles(set(op.ALL_TYPES) - {op.SYMBOL, op.ITE})
+    def walk_operands(self, formula, args, **kwargs):
+        return And(args)
+
+    def walk_symbol(self, formula, args, **kwargs):
+        return FALSE() if formula is self.unknown else TRUE()
+
+    def walk_ite(self, formula, args, **kwargs):
+        return And(args[0], Ite(formula.arg(0), args[1], args[2]))
+
+def _number(value):
+    return "(%d)" % value if value < 0 else "%d" % value
+
+def _shared(*terms):
+    # the subterms of terms with more than one parent
+    seen = set()
+    shared = set()
+    stack = list(terms)
+    while len(stack) > 0:
+        node = stack.pop()
+        if node in seen:
+            shared.add(node)
+            continue
+        seen.add(node)
+        stack.extend(node.args())
+    return shared
+
+def _python_function(summary, name, names, unknown):
+    # the Ite at the top of summary, the skeleton, become if statements
+    # and the rest Python expressions; a part of the skeleton reached from
+    # more than one place, or nested too deep, is a function of its own
+    expr = _PythonExpr(names)
+    arguments = ", ".join(names.arguments + [names.unknown])
+    skeleton = set()
+    stack = [summary]
+    while len(stack) > 0:
+        node = stack.pop()
+        if node.is_ite() and node not in skeleton:
+            skeleton.add(node)
+            stack.extend(node.args()[1:])
+    helpers = dict((node, "_s%d" % i) for i, node in enumerate(n for n in _shared(summary) if n in skeleton))
+
+    lines = []
+    functions = [(name, summary)]
+    done = set()
+    while len(functions) > 0:
+        fname, root = functions.pop()
+        if fname in done:
+            continue
+        done.add(fname)
+        if fname == name:
+            lines.append("def %s(%s=None):" % (fname, arguments))
+        else:
+            lines.append("def %s(%s):" % (fname, arguments))
+        body = [(root, 1)]
+        while len(body) > 0:
+            node, depth = body.pop()
+            indent = "    " * depth
+            if node in helpers and node is not root:
+                functions.append((helpers[node], node))
+                lines.append("%sreturn %s(%s)" % (indent, helpers[node], arguments))
+            elif node.is_ite() and node in skeleton and depth > MAX_NESTING:
+                helpers[node] = "_s%d" % len(helpers)
+                functions.append((helpers[node], node))
+                lines.append("%sreturn %s(%s)" % (indent, helpers[node], arguments))
+            elif node.is_ite() and node in skeleton:
+                lines.append("%sif %s:" % (indent, expr.walk(node.arg(0))))
+                # the else branch follows the if, at the same depth
+                body.append((node.arg(2), depth))
+                body.append((node.arg(1), depth + 1))
+            else:
+                lines.append("%sreturn %s" % (indent, expr.walk(node)))
+        lines.append("")
+    return lines
+
+def _numpy_function(summary, name, names, unknown):
+    t = unknown.symbol_type()
+    zero = BV(0, t.width) if t.is_bv_type() else Bool(False) if t.is_bool_type() else Int(0)
+    value = summary.substitute({unknown: zero})
+    defined = _Defined(unknown).walk(summary).simplify()
+
+    expr = _NumpyExpr(names, [value, defined])
+    lines = ["def %s(%s):" % (name, ", ".join(names.arguments))]
+    # the arguments the summary doesn't use still shape the result
+    symbols = dict((n, s) for s, n in names.variables.items())
+    inputs = []
+    for n in names.arguments:
+        s = symbols.get(n)
+        if s is not None and s.symbol_type().is_function_type():
+            continue
+        inputs.append(n)
+        if s is not None and s.symbol_type().is_bv_type():
+            if s.symbol_type().width > 64:
+                raise NotImplementedError("Can't vectorize %d bit integers" % s.symbol_type().width)
+            lines.append("    %s = _wrap(np.asarray(%s, dtype=np.int64), %d)" % (n, n, s.symbol_type().width))
+        else:
+            lines.append("    %s = np.asarray(%s)" % (n, n))
+    lines.append("    with np.errstate(all=\"ignore\"):")
+    value_text = expr.walk(value)
+    defined_text = expr.walk(defined)
+    lines.extend("        " + line for line in expr.lines)
+    lines.append("        _value = %s" % value_text)
+    lines.append("        _defined = %s" % defined_text)
+    lines.append("    _value = np.broadcast_arrays(%s)[0]" % ", ".join(["_value"] + inputs))
+    if defined.is_true():
+        lines.append("    return _value")
+    else:
+        lines.append("    _defined = np.broadcast_to(_defined, _value.shape)")
+        lines.append("    return np.ma.masked_array(_value, mask=np.logical_not(_defined))")
+    lines.append("")
+    return lines
@@ -2,20 +2,44 @@
 
 import logging
 
+from pyexsmt import pred_to_smt
+
+from pysmt.shortcuts import *
+
 class Constraint:
     cnt = 0
     """A constraint is a list of predicates leading to some specific
        position in the code."""
+    # millions of these make up the tree of a large exploration
+    __slots__ = ("inputs", "predicate", "effect", "processed", "infeasible", \
+                 "parent", "depth", "prefix", "formula", "index", "id")
+
     def __init__(self, parent, last_predicate):
         self.inputs = None
         self.predicate = last_predicate
         self.effect = None
         self.processed = False
+        # None, or why negating the predicate is impossible: "unsat" if the
+        # solver said so, "pruned" if a known unsat core ruled it out
+        self.infeasible = None
         self.parent = parent
-        self.children = []
+        self.depth = 0 if parent is None else parent.depth + 1
+        # the predicates from here up to the root, as a cons-list
+        # (predicate, parent.prefix) shared with every descendant
+        self.prefix = None if parent is None else (last_predicate, parent.prefix)
+        # conjunction of the predicates from the root down, see get_formula
+        self.formula = TRUE() if parent is None else None
+        # Predicate -> child, None for a leaf
+        self.index = None
         self.id = self.__class__.cnt
         self.__class__.cnt += 1
 
+    @property
+    def children(self):
+        if self.index is None:
+            return []
+        return list(self.index.values())
+
     def __eq__(self, other):
         """Two Constraints are equal iff they have the same chain of predicates"""
         if isinstance(other, Constraint):
@@ -35,17 +59,30 @@ class Constraint:
         if self.parent is None:
             return []
         asserts = []
-        tmp = self.parent
-        while tmp.predicate is not None:
-            asserts.append(tmp.predicate)
-            tmp = tmp.parent
+        tmp = self.parent.prefix
+        while tmp is not None:
+            asserts.append(tmp[0])
+            tmp = tmp[1]
 
         return asserts
 
+    def get_formula(self):
+        '''
+        returns the conjunction of the predicates on the path to here,
+        built once per node on top of the parent's
+        '''
+        pending = []
+        tmp = self
+        while tmp.formula is None:
+            pending.append(tmp)
+            tmp = tmp.parent
+        for c in reversed(pending):
+            f = pred_to_smt(c.predicate)
+            c.formula = f if c.parent.parent is None else And(f, c.parent.formula)
+        return self.formula
+
     def get_length(self):
-        if self.parent == None:
-            return 0
-        return 1 + self.parent.get_length()
+        return self.depth
 
     def __str__(self):
         return str(self.predicate) + "  (processed: %s, path_len: %d)" % (self.processed,self.get_length())
@@ -57,14 +94,15 @@ class Constraint:
         return s
 
     def find_child(self, predicate):
-        for c in self.children:
-            if predicate == c.predicate:
-                return c
-        return None
+        if self.index is None:
+            return None
+        return self.index.get(predicate)
 
     def add_child(self, predicate):
         assert(self.find_child(predicate) is None)
         c = Constraint(self, predicate)
-        self.children.append(c)
+        if self.index is None:
+            self.index = {}
+        self.index[predicate] = c
         return c
 
@@ -0,0 +1,297 @@
+# Copyright: see copyright.txt
+
+import itertools
+import json
+import logging
+import socket
+import socketserver
+import threading
+import time
+
+from pyexsmt.parallel import ExplorationWorker, ParallelExplorationEngine, UNKNOWN
+from pyexsmt import get_symbolic_from_expr
+from pyexsmt import smtlib
+from pyexsmt.symbolic_types import SymbolicObject
+
+# seconds a worker may hold a task before it is handed to someone else
+LEASE_TIMEOUT = 120
+
+def parse_address(address):
+    '''
+    address : "host:port"
+    returns (host, port)
+    '''
+    host, _, port = address.rpartition(":")
+    return (host or "localhost", int(port))
+
+def _send(stream, message):
+    stream.write(json.dumps(message) + "\n")
+    stream.flush()
+
+def _receive(stream):
+    line = stream.readline()
+    if line == "":
+        return None
+    return json.loads(line)
+
+class _WorkerHandler(socketserver.StreamRequestHandler):
+    """Serves one worker connection for the lifetime of the worker."""
+    def handle(self):
+        engine = self.server.engine
+        worker = next(engine.worker_ids)
+        logging.info("Worker %d connected from %s", worker, self.client_address)
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    break
+                message = json.loads(line.decode())
+                if "hello" in message:
+                    reply = engine.hello()
+                else:
+                    reply = engine.exchange(worker, message["results"], message["batch"])
+                self.wfile.write((json.dumps(reply) + "\n").encode())
+                self.wfile.flush()
+                if reply.get("done"):
+                    break
+        except (OSError, ValueError, TypeError, KeyError) as error:
+            logging.warning("Worker %d failed: %s", worker, error)
+        finally:
+            engine.disconnect(worker)
+            logging.info("Worker %d disconnected", worker)
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class DistributedExplorationEngine(ParallelExplorationEngine):
+    """Owns the constraint tree and hands out unsolved path prefixes, in
+       batches, to workers connecting over TCP (pyexsmt --worker host:port).
+       Every task handed out is leased: if its worker disconnects or holds
+       it for longer than LEASE_TIMEOUT seconds, it is queued again."""
+    def __init__(self, funcinv, target, address, solver="z3", strategy=None, query_timeout=0):
+        ParallelExplorationEngine.__init__(self, funcinv, target, solver=solver, jobs=0, strategy=strategy, \
+                                           query_timeout=query_timeout)
+        self.address = address
+        self.lock = threading.Lock()
+        self.worker_ids = itertools.count()
+        # task id -> (constraint, worker, lease start)
+        self.leases = {}
+        self.finished = False
+        self.iterations = 0
+        self.max_iterations = 0
+        self.hello_message = None
+        # executions merged since explore_iter last yielded
+        self.executions = []
+
+    def explore_iter(self, max_iterations=0, max_depth=0, funcs=[], mod=None, time_budget=0):
+        # executions are yielded in the order the workers send them back
+        self.path.max_depth = max_depth
+        self.path.mod = mod
+        deadline = time.time() + time_budget if time_budget > 0 else None
+        self.path.deadline = deadline
+
+        self.iterations = self.result.num_executions
+        if self.iterations == 0:
+            if not self._timed_execution(funcs):
+                self._finish()
+                return
+            self.iterations = 1
+            yield self.result.last
+        # the paths the workers send back are replayed whatever the time
+        self.path.deadline = None
+        self.max_iterations = max_iterations
+
+        self.hello_message = {"target": list(self.target), "solver": self.solver_name, \
+                              "max_depth": max_depth, "mod": None if mod is None else smtlib.dumps([mod]), \
+                              "query_timeout": self.query_timeout}
+
+        server = _Server(self.address, _WorkerHandler)
+        server.engine = self
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        logging.info("Coordinator listening on %s:%d", *server.server_address)
+
+        try:
+            while True:
+                with self.lock:
+                    self._check()
+                    if deadline is not None and time.time() >= deadline:
+                        logging.info("Time budget (%ss) exhausted, terminating", time_budget)
+                        self.result.timed_out = True
+                        self.finished = True
+                    executions = self.executions
+                    self.executions = []
+                    finished = self.finished
+                # outside the lock, so that the workers aren't held up
+                for execution in executions:
+                    yield execution
+                if finished:
+                    break
+                time.sleep(0.1)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+            with self.lock:
+                self.finished = True
+                for c, _, _ in self.leases.values():
+                    c.processed = False
+                    self.constraints_to_solve.add(c)
+                self.leases = {}
+                self._finish()
+
+    # called from the worker connections
+
+    def hello(self):
+        return self.hello_message
+
+    def exchange(self, worker, results, batch):
+        '''
+        results : [[task id, outcome]] computed by worker since last time,
+        outcomes encoded by _encode
+        batch : how many tasks worker wants next
+        '''
+        with self.lock:
+            for task_id, outcome in results:
+                lease = self.leases.pop(task_id, None)
+                if lease is None:
+                    # the lease expired and the task was solved elsewhere
+                    continue
+                if self._complete(lease[0], _decode(outcome)):
+                    self.iterations += 1
+                    self.num_processed_constraints += 1
+                    self.executions.append(self.result.last)
+            self._check()
+            if self.finished:
+                return {"tasks": [], "done": True}
+
+            tasks = []
+            while len(tasks) < batch:
+                task = self._next_task()
+                if task is None:
+                    break
+                selected, text = task
+                self.leases[selected.id] = (selected, worker, time.time())
+                tasks.append([selected.id, text])
+            return {"tasks": tasks}
+
+    def disconnect(self, worker):
+        with self.lock:
+            self._requeue(lambda w, start: w == worker)
+
+    # private
+
+    def _check(self):
+        # must hold self.lock
+        if self.finished:
+            return
+        self._requeue(lambda w, start: time.time() - start > LEASE_TIMEOUT)
+        if self.max_iterations != 0 and self.iterations >= self.max_iterations:
+            logging.debug("Maximum number of iterations reached, terminating")
+            self.finished = True
+        elif len(self.leases) == 0 and len(self.constraints_to_solve) == 0 and not self._retry_deferred():
+            logging.info("EXPLORATION COMPLETE")
+            self.finished = True
+
+    def _requeue(self, expired):
+        for task_id, (c, worker, start) in list(self.leases.items()):
+            if expired(worker, start):
+                logging.debug("REQUEUEING CONSTRAINT: %s", c)
+                del self.leases[task_id]
+                c.processed = False
+                self.constraints_to_solve.add(c)
+
+def run_worker(address, batch=8):
+    '''
+    Connect to the coordinator at address ("host:port") and solve and
+    execute the tasks it hands out until it says the exploration is done.
+    The target file must be reachable under the same path as on the
+    coordinator.
+    '''
+    sock = socket.create_connection(parse_address(address))
+    stream = sock.makefile("rw")
+    try:
+        _send(stream, {"hello": True})
+        hello = _receive(stream)
+        worker = ExplorationWorker(tuple(hello["target"]), hello["solver"], hello["max_depth"], hello["mod"], \
+                                   hello["query_timeout"])
+
+        results = []
+        while True:
+            _send(stream, {"results": results, "batch": batch})
+            reply = _receive(stream)
+            if reply is None or reply.get("done"):
+                return
+            results = []
+            if len(reply["tasks"]) == 0:
+                # everything is leased out; new work appears as results come in
+                time.sleep(0.1)
+            for task_id, text in reply["tasks"]:
+                try:
+                    outcome = worker.run(text)
+                except Exception as error:
+                    logging.error("Worker failed on task %d: %s", task_id, error)
+                    outcome = UNKNOWN
+                results.append([task_id, _encode(outcome)])
+    finally:
+        stream.close()
+        sock.close()
+
+def _encode(outcome):
+    # plain JSON would turn tuples into lists and dict keys into strings;
+    # they are tagged instead. Outcomes come from the network, so they are
+    # never unpickled
+    if outcome is None or outcome == UNKNOWN:
+        return outcome
+    text, results, inputs, symbolic_effect, effect = outcome
+    try:
+        effect = _tagged(effect)
+    except TypeError:
+        logging.warning("Can't send return value %s, sending its repr", repr(effect))
+        effect = repr(effect)
+    return [text, results, [[k, _tagged(v)] for k, v in inputs], symbolic_effect, effect]
+
+def _decode(message):
+    if message is None or message == UNKNOWN:
+        return message
+    text, results, inputs, symbolic_effect, effect = message
+    return (text, results, [(k, _untagged(v)) for k, v in inputs], symbolic_effect, _untagged(effect))
+
+def _tagged(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, SymbolicObject):
+        return {"symbolic": [smtlib.dumps([value.expr]), _tagged(value.get_concr_value())]}
+    if isinstance(value, list):
+        return [_tagged(v) for v in value]
+    if isinstance(value, tuple):
+        return {"tuple": [_tagged(v) for v in value]}
+    if isinstance(value, (set, frozenset)):
+        return {type(value).__name__: [_tagged(v) for v in value]}
+    if isinstance(value, dict):
+        return {"dict": [[_tagged(k), _tagged(v)] for k, v in value.items()]}
+    raise TypeError("Can't send %s" % type(value).__name__)
+
+def _untagged(value):
+    if isinstance(value, list):
+        return [_untagged(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) != 1:
+        raise ValueError("Malformed value: %s" % value)
+    tag, items = next(iter(value.items()))
+    if tag == "symbolic":
+        value = get_symbolic_from_expr(smtlib.loads(items[0])[0])
+        value.concr = _untagged(items[1])
+        return value
+    if tag == "tuple":
+        return tuple(_untagged(v) for v in items)
+    if tag == "set":
+        return set(_untagged(v) for v in items)
+    if tag == "frozenset":
+        return frozenset(_untagged(v) for v in items)
+    if tag == "dict":
+        return dict((_untagged(k), _untagged(v)) for k, v in items)
+    raise ValueError("Unknown tag: %s" % tag)
@@ -1,18 +1,27 @@
 # Copyright: see copyright.txt
 
-from collections import deque
 import logging
+import time
 
-from pyexsmt.path_to_constraint import PathToConstraint
-from pyexsmt import pred_to_smt
+from pyexsmt.path_to_constraint import PathToConstraint, TimeBudgetExhausted
+from pyexsmt import pred_to_smt, set_concr_values
 from pyexsmt.symbolic_types import symbolic_object
 from pyexsmt.result import Result
+from pyexsmt.incremental import IncrementalSolver
+from pyexsmt.strategy import STRATEGIES
+from pyexsmt.cache import QueryCache, CounterexampleCache, CachedModel
+from pyexsmt.slicing import independent_slice
+from pyexsmt import checkpoint
+from pyexsmt import portfolio
 
 from pysmt.shortcuts import *
+from pysmt.exceptions import PysmtException, SolverReturnedUnknownResultError
 
+CORE_LIMIT = 4096
 
 class ExplorationEngine:
-    def __init__(self, funcinv, solver="z3"):
+    def __init__(self, funcinv, solver="z3", incremental=False, strategy=None, cache_size=0, \
+                 cex_cache_size=0, slicing=False, unsat_cores=False, query_timeout=0):
         self.invocation = funcinv
         # the input to the function
         self.symbolic_inputs = {}  # string -> SymbolicObject
@@ -20,61 +29,181 @@ class ExplorationEngine:
         for n in funcinv.get_names():
             self.symbolic_inputs[n] = funcinv.create_arg_value(n)
 
-        self.constraints_to_solve = deque([])
+        # when solving incrementally, depth-first order makes consecutive
+        # queries share the longest prefix with the solver stack
+        if strategy is None:
+            strategy = "dfs" if incremental else "bfs"
+        if isinstance(strategy, str):
+            strategy = STRATEGIES[strategy]()
+        self.constraints_to_solve = strategy
         self.num_processed_constraints = 0
 
         self.path = PathToConstraint(lambda c : self.add_constraint(c))
         # link up SymbolicObject to PathToConstraint in order to intercept control-flow
         symbolic_object.SymbolicObject.SI = self.path
 
-        self.solver = Solver(solver)
+        self.solver_name = solver
+        self.solver = portfolio.create_solver(solver, query_timeout)
         self.solver.solve() # generate initial values
         # link up SymbolicObject to the Solver to get concrete values during execution
         symbolic_object.SymbolicObject.SOLVER = self.solver 
 
+        # keep the solver's assertion stack in sync with the constraint tree
+        if incremental and isinstance(self.solver, portfolio.PortfolioSolver):
+            logging.warning("Incremental solving is not supported by solver portfolios, ignoring")
+            incremental = False
+        self.incremental = IncrementalSolver(self.solver) if incremental else None
+
+        # remember the outcome of queries
+        self.query_cache = QueryCache(cache_size) if cache_size > 0 else None
+        # remember the models of past executions and try them on new queries
+        self.cex_cache = CounterexampleCache(cex_cache_size) if cex_cache_size > 0 else None
+
+        # only send the solver the predicates the query depends on
+        self.slicing = slicing
+        self.current_inputs = None
+
+        # unsat cores learnt so far; a query containing one is refuted for free
+        self.unsat_cores = CounterexampleCache(CORE_LIMIT) if unsat_cores else None
+
+        # constraints whose query came back unknown, retried once at the end
+        self.deferred = []
+        self.retried = set()
+        self.num_unknown = 0
+        self.num_abandoned = 0
+
+        # journal of the exploration, see checkpoint_to
+        self.checkpoint = None
+
         # outputs
         self.result = Result(self.path)
 
     def add_constraint(self, constraint):
-        logging.debug("ADDING CONSTRAINT: %s", repr(constraint))
-        self.constraints_to_solve.append(constraint)
+        logging.debug("ADDING CONSTRAINT: %r", constraint)
+        constraint.inputs = self.current_inputs
+        if self.checkpoint is not None:
+            self.checkpoint.node(constraint)
+        self.constraints_to_solve.add(constraint)
 
-    def explore(self, max_iterations=0, max_depth=0, funcs=[], mod=None):
+    def checkpoint_to(self, filename, interval=5):
+        '''
+        Journal the exploration to filename, flushing at most every interval
+        seconds, so that it can be resumed with resume_from
+        '''
+        self.checkpoint = checkpoint.Checkpoint(filename, self.path.root_constraint, interval)
+
+    def resume_from(self, filename):
+        '''
+        Restore the tree, the queue and the recorded executions from the
+        journal in filename. Must be called before checkpoint_to and explore.
+        '''
+        checkpoint.restore(filename, self)
+
+    def explore(self, max_iterations=0, max_depth=0, funcs=[], mod=None, time_budget=0):
+        '''
+        time_budget : wall-clock seconds after which the partial result is
+        returned, 0 for no limit
+        '''
+        for _ in self.explore_iter(max_iterations, max_depth, funcs, mod, time_budget):
+            pass
+        return self.result
+
+    def explore_iter(self, max_iterations=0, max_depth=0, funcs=[], mod=None, time_budget=0):
+        '''
+        The same as explore, but yields the result.Execution of each path
+        as soon as it has run. self.result is complete once the generator
+        is exhausted or closed.
+        '''
         self.path.max_depth = max_depth
         self.path.mod = mod
+        deadline = time.time() + time_budget if time_budget > 0 else None
+        self.path.deadline = deadline
 
-        self._one_execution(funcs)
-        
-        iterations = 1
-        if max_iterations != 0 and iterations >= max_iterations:
-            logging.debug("Maximum number of iterations reached, terminating")
-            return self.result
-
-        while not self._is_exploration_complete():
-            selected = self.constraints_to_solve.popleft()
-            if selected.processed:
-                continue		
+        try:
+            iterations = self.result.num_executions
+            if iterations == 0:
+                if not self._timed_execution(funcs):
+                    return
+                iterations = 1
+                yield self.result.last
 
-            logging.debug("SELECTED CONSTRAINT: %s", repr(selected))
-            asserts, query = selected.get_asserts_and_query()
-            self._find_counterexample(asserts, query)
+            if max_iterations != 0 and iterations >= max_iterations:
+                logging.debug("Maximum number of iterations reached, terminating")
+                return
 
-            if not self.solver.last_result:
-                continue
+            while not self._is_exploration_complete() or self._retry_deferred():
+                if deadline is not None and time.time() >= deadline:
+                    logging.info("Time budget (%ss) exhausted, terminating", time_budget)
+                    self.result.timed_out = True
+                    break
 
-            self._one_execution(funcs, selected)
+                selected = self.constraints_to_solve.pop()
+                if selected.processed:
+                    continue
 
-            iterations += 1			
-            self.num_processed_constraints += 1
+                logging.debug("SELECTED CONSTRAINT: %r", selected)
+                sat = self._find_counterexample(selected)
+                if sat is None:
+                    self._defer(selected)
+                    continue
+                if sat and not self._timed_execution(funcs, selected):
+                    # solved again if the exploration is resumed
+                    selected.processed = False
+                    self.constraints_to_solve.add(selected)
+                    break
+                # after the records of the execution, so that a resumed run
+                # doesn't take a constraint whose execution was lost for done
+                if self.checkpoint is not None:
+                    self.checkpoint.done(selected)
+                    self.checkpoint.flush()
+                if not sat:
+                    continue
 
-            if max_iterations != 0 and iterations >= max_iterations:
-                logging.debug("Maximum number of iterations reached, terminating")
-                break
+                iterations += 1
+                self.num_processed_constraints += 1
+                yield self.result.last
 
-        return self.result
+                if max_iterations != 0 and iterations >= max_iterations:
+                    logging.debug("Maximum number of iterations reached, terminating")
+                    break
+        finally:
+            self._finish()
 
     # private
 
+    def _defer(self, constraint):
+        self.num_unknown += 1
+        if constraint.id in self.retried:
+            logging.debug("ABANDONED CONSTRAINT: %s", constraint)
+            self.num_abandoned += 1
+        else:
+            logging.debug("DEFERRED CONSTRAINT: %s", constraint)
+            self.deferred.append(constraint)
+
+    def _retry_deferred(self):
+        # give the queries that came back unknown a second chance, once
+        # everything else has been tried
+        for c in self.deferred:
+            if len(c.parent.children) == 2:
+                # the other branch was reached in the meantime
+                continue
+            self.retried.add(c.id)
+            c.processed = False
+            self.constraints_to_solve.add(c)
+        self.deferred = []
+        return len(self.constraints_to_solve) > 0
+
+    def _finish(self):
+        self.num_abandoned += len(self.deferred)
+        self.result.pending = len(self.constraints_to_solve) + len(self.deferred)
+        self.result.abandoned = self.num_abandoned
+        if self.checkpoint is not None:
+            self.checkpoint.flush(True)
+        if isinstance(self.solver, portfolio.PortfolioSolver):
+            # don't leave the backends running until the interpreter exits
+            self.solver.close()
+        return self.result
+
     def _is_exploration_complete(self):
         num_constr = len(self.constraints_to_solve)
         if num_constr == 0:
@@ -88,8 +217,12 @@ class ExplorationEngine:
     def _one_execution(self, funcs=[], expected_path=None):
         logging.debug("EXPECTED PATH: %s", expected_path)
 
+        set_concr_values(self.symbolic_inputs.values())
         self.result.record_inputs(self.symbolic_inputs)
-        logging.info("USING INPUTS: %s", self.result.generated_inputs[-1])
+        if self.slicing:
+            # the constraints discovered now remember the values that reached them
+            self.current_inputs = self._snapshot_model([])
+        logging.info("USING INPUTS: %s", self.result.current_inputs)
 
         self.path.reset(expected_path)
 
@@ -98,12 +231,160 @@ class ExplorationEngine:
         except Exception:
             ret = None
 
-        logging.debug("CURRENT CONSTARINT: %s", repr(self.path.current_constraint))
+        logging.debug("CURRENT CONSTARINT: %r", self.path.current_constraint)
         logging.info("RETURN: %s", ret)
 
+        self.constraints_to_solve.executed(self.path.current_constraint)
+
+        if self.cex_cache is not None:
+            self._record_counterexample(self.path.current_constraint)
+
         self.result.record_output(ret)
+        self._checkpoint_execution(ret)
+
+    def _timed_execution(self, funcs=[], expected_path=None):
+        '''
+        runs _one_execution; returns False, and records nothing, if the
+        time budget ran out during it
+        '''
+        try:
+            self._one_execution(funcs, expected_path)
+            return True
+        except TimeBudgetExhausted:
+            logging.info("Time budget exhausted during an execution, terminating")
+            self.result.timed_out = True
+            return False
+
+    def _checkpoint_execution(self, ret):
+        if self.checkpoint is not None:
+            self.checkpoint.execution(self.path.current_constraint, self.result.last.inputs, \
+                                      ret, self.result.last.value)
+
+    def _find_counterexample(self, constraint):
+        '''
+        returns True, and makes the model available to the symbolic inputs,
+        if the path asserts of constraint can be satisfied together with its
+        negated predicate, or None if the solver couldn't tell
+        '''
+        asserts, query = constraint.get_asserts_and_query()
+        inputs = constraint.inputs
+        sliced = self.slicing and inputs is not None
+        if sliced:
+            sliced_asserts = independent_slice(asserts, query)
+            assumptions = [pred_to_smt(p) for p in sliced_asserts] + [Not(pred_to_smt(query))]
+            if _has_functions(assumptions):
+                # the model of an uninterpreted function can't be merged
+                # into the values kept from inputs, see _merge_model
+                sliced = False
+            else:
+                asserts = sliced_asserts
+        if not sliced:
+            assumptions = [pred_to_smt(p) for p in asserts] + [Not(pred_to_smt(query))]
+
+        if self.unsat_cores is not None and self.unsat_cores.lookup(assumptions) is not None:
+            logging.debug("PRUNED BY UNSAT CORE: %s", constraint)
+            constraint.infeasible = "pruned"
+            self.path.num_pruned += 1
+            return False
+
+        sat, model = self._solve(asserts, query, assumptions)
+        if sat is None:
+            return None
+        if sat:
+            if sliced:
+                # the symbols outside the slice keep their current values
+                model = self._merge_model(inputs, model, assumptions)
+            self._use_model(model)
+        else:
+            constraint.infeasible = "unsat"
+        return sat
+
+    def _solve(self, asserts, query, assumptions):
+        '''
+        returns (sat, model) where model provides the values of a solution,
+        or (None, None) if the solver gave up
+        '''
+        if self.query_cache is not None:
+            cached = self.query_cache.lookup(assumptions)
+            if cached is not None:
+                return cached
+
+        if self.cex_cache is not None:
+            cached = self.cex_cache.lookup(assumptions)
+            if cached is not None:
+                return cached
+
+        try:
+            if self.incremental is not None:
+                logging.debug("SOLVING INCREMENTALLY: %s", query)
+                sat = self.incremental.solve(asserts, query)
+            else:
+                logging.debug("SOLVING: %s", assumptions)
+                sat = self.solver.solve(assumptions)
+        except SolverReturnedUnknownResultError:
+            logging.debug("UNKNOWN: %s", assumptions)
+            return None, None
+        self._use_model(self.solver)
+
+        if not sat and self.unsat_cores is not None:
+            self._learn_unsat_core(assumptions)
+
+        if self.query_cache is not None or self.cex_cache is not None:
+            model = self._snapshot_model(assumptions) if sat else None
+            if not sat or model is not None:
+                if self.query_cache is not None:
+                    self.query_cache.store(assumptions, sat, model)
+                if self.cex_cache is not None:
+                    self.cex_cache.store(assumptions, model)
+        return sat, self.solver
+
+    def _learn_unsat_core(self, assumptions):
+        try:
+            core = list(get_unsat_core(assumptions, solver_name=portfolio.backends(self.solver_name)[0]))
+        except PysmtException as error:
+            logging.debug("No unsat core available: %s", error)
+            return
+        logging.debug("UNSAT CORE: %s", core)
+        self.unsat_cores.store(core, None)
+        if self.cex_cache is not None:
+            self.cex_cache.store(core, None)
+
+    def _merge_model(self, inputs, model, formulas):
+        assignment = dict(inputs.assignment)
+        for f in formulas:
+            for s in f.get_free_variables():
+                assignment[s] = model.get_value(s)
+        return CachedModel(assignment)
+
+    def _record_counterexample(self, constraint):
+        # the inputs just used satisfy every predicate on the path they took
+        if constraint.predicate is None:
+            return
+        formulas = [pred_to_smt(constraint.predicate)] + [pred_to_smt(p) for p in constraint.get_asserts()]
+        model = self._snapshot_model(formulas)
+        if model is not None:
+            self.cex_cache.store(formulas, model)
+
+    def _use_model(self, model):
+        # link up SymbolicObject to whatever provides the current concrete values
+        symbolic_object.SymbolicObject.SOLVER = model
+
+    def _snapshot_model(self, formulas):
+        '''
+        returns a CachedModel of the current solver model restricted to the
+        symbolic inputs and the free symbols of formulas, or None if it can't
+        be reproduced without the solver (uninterpreted functions)
+        '''
+        symbols = set()
+        for f in formulas:
+            symbols.update(f.get_free_variables())
+        for v in self.symbolic_inputs.values():
+            if isinstance(v, symbolic_object.SymbolicObject):
+                symbols.update(v.expr.get_free_variables())
+        if any(s.symbol_type().is_function_type() for s in symbols):
+            return None
+        model = symbolic_object.SymbolicObject.SOLVER
+        return CachedModel(dict((s, model.get_value(s)) for s in symbols))
 
-    def _find_counterexample(self, asserts, query):
-        assumptions = [pred_to_smt(p) for p in asserts] + [Not(pred_to_smt(query))]
-        logging.debug("SOLVING: %s", assumptions)
-        self.solver.solve(assumptions)
+def _has_functions(formulas):
+    return any(s.symbol_type().is_function_type() for f in formulas for s in f.get_free_variables())
@@ -0,0 +1,120 @@
+# Copyright: see copyright.txt
+
+import json
+from io import StringIO
+
+from graphviz import Source
+from pysmt.fnode import FNode
+from pysmt.printers import HRPrinter
+
+from pyexsmt.symbolic_types.symbolic_object import to_pysmt
+
+# Exports the constraint tree as it is walked, depth-first with an explicit
+# stack, writing every node to the output as soon as it is reached: the
+# time is linear in the size of the tree and the memory in its depth.
+#
+# Every constraint is one node of the graph, named after its id: a decision
+# labelled with the predicate its children branch on, or a leaf labelled
+# with the return value of the path that ended there. Edges are labelled
+# 1 for the branch where the predicate holds and 0 for the other one.
+
+DECISION = "decision"
+LEAF = "leaf"
+# the branch the solver showed impossible to take
+INFEASIBLE = "infeasible"
+# a subtree left out because of the limits or because it was collapsed
+TRUNCATED = "truncated"
+
+def nodes(root, max_depth=0, max_nodes=0, collapse=()):
+    '''
+    root : the Constraint to start from
+    max_depth : don't show the nodes deeper than this, 0 for no limit
+    max_nodes : stop after this many nodes, 0 for no limit; the nodes
+    whose children are left out then get a single truncated child each
+    collapse : ids of the constraints to show without their subtree
+    yields (name, parent name, branch, kind, label) in depth-first order,
+    parents first; branch is None for root
+    '''
+    text = _Printer()
+    stack = [(root, None, None)]
+    count = 0
+    while len(stack) > 0:
+        c, parent, branch = stack.pop()
+        name = "c%d" % c.id
+        count += 1
+        if max_nodes > 0 and count > max_nodes:
+            # one marker for each node with children left out, then stop
+            marked = set()
+            for c, parent, branch in [(c, parent, branch)] + stack[::-1]:
+                if parent not in marked:
+                    marked.add(parent)
+                    yield parent + "t", parent, branch, TRUNCATED, "..."
+            return
+        if max_depth > 0 and c.depth - root.depth > max_depth:
+            yield name, parent, branch, TRUNCATED, "..."
+            continue
+        if c.id in collapse:
+            yield name, parent, branch, TRUNCATED, "collapsed"
+            continue
+        children = c.children
+        if len(children) == 0:
+            yield name, parent, branch, LEAF, _label(c.effect, text)
+            continue
+        yield name, parent, branch, DECISION, text(children[0].predicate.symtype.expr)
+        if len(children) == 1 and children[0].infeasible is not None:
+            child = children[0]
+            count += 1
+            yield "c%dx" % child.id, name, not child.predicate.result, INFEASIBLE, child.infeasible.upper()
+        # the branch where the predicate holds comes out first
+        for child in sorted(children, key=lambda child: child.predicate.result):
+            stack.append((child, name, child.predicate.result))
+
+def write_dot(out, root, **limits):
+    '''
+    out : file to write the DOT graph to
+    limits : see nodes
+    '''
+    out.write("digraph {\n")
+    for name, parent, branch, kind, label in nodes(root, **limits):
+        style = {INFEASIBLE: ", style=dashed", TRUNCATED: ", style=dotted"}.get(kind, "")
+        out.write("\"%s\" [ label=\"%s\"%s ];\n" % (name, _escape(label), style))
+        if parent is not None:
+            out.write("\"%s\" -> \"%s\" [ label=\"%d\" ];\n" % (parent, name, branch))
+    out.write("}\n")
+
+def write_json(out, root, **limits):
+    '''
+    out : file to write the tree to, one JSON record per node
+    limits : see nodes
+    '''
+    for name, parent, branch, kind, label in nodes(root, **limits):
+        record = {"id": name, "parent": parent, "branch": None if branch is None else int(branch), \
+                  "kind": kind, "label": label}
+        out.write(json.dumps(record) + "\n")
+
+def render(filename):
+    # needs the graphviz binaries
+    Source.from_file(filename, format="png").view()
+
+class _Printer:
+    """str() of a pySMT formula, without setting up a new printer (which
+       costs far more than printing a predicate) every time."""
+    def __init__(self):
+        self.buffer = StringIO()
+        self.printer = HRPrinter(self.buffer)
+
+    def __call__(self, expr):
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.printer.printer(expr)
+        return self.buffer.getvalue()
+
+def _label(effect, text):
+    try:
+        expr = to_pysmt(effect)
+    except NotImplementedError:
+        return repr(effect)
+    return text(expr) if isinstance(expr, FNode) else str(expr)
+
+def _escape(label):
+    return label.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
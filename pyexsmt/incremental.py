@@ -0,0 +1,76 @@
+# Copyright: see copyright.txt
+
+import logging
+
+from pyexsmt import pred_to_smt
+
+from pysmt.shortcuts import *
+
+class IncrementalSolver:
+    """Keeps the assertion stack of a pySMT solver in sync with a path of the
+       constraint tree. Every predicate on the path gets its own push level, so
+       consecutive queries that share a prefix only send the differing suffix."""
+    def __init__(self, solver):
+        self.solver = solver
+        # predicates currently asserted, ordered from the root down
+        self.stack = []
+        self.reused = 0
+        self.sent = 0
+
+    def sync(self, asserts):
+        '''
+        asserts : [Predicate] as returned by Constraint.get_asserts,
+        i.e. the predicate closest to the query comes first
+        '''
+        path = asserts[::-1]
+        common = 0
+        limit = min(len(path), len(self.stack))
+        while common < limit and self.stack[common] is path[common]:
+            common += 1
+
+        stale = len(self.stack) - common
+        if stale > 0:
+            self.solver.pop(stale)
+            del self.stack[common:]
+
+        for p in path[common:]:
+            self.solver.push()
+            self.solver.add_assertion(pred_to_smt(p))
+            self.stack.append(p)
+
+        self.reused += common
+        self.sent += len(path) - common
+        logging.debug("INCREMENTAL: reused %d, popped %d, pushed %d", \
+                      common, stale, len(path) - common)
+
+    def sync_to(self, constraint):
+        '''
+        Like sync, with the stack following the path from the root to
+        constraint. Only the part of the path that changed is walked, so
+        following a path down one branch at a time costs O(1) per branch.
+        A solver is kept in sync either with sync or with sync_to, not both.
+        '''
+        path = []
+        tmp = constraint
+        while tmp.predicate is not None and not \
+              (tmp.depth <= len(self.stack) and self.stack[tmp.depth - 1] is tmp):
+            path.append(tmp)
+            tmp = tmp.parent
+        common = tmp.depth
+
+        stale = len(self.stack) - common
+        if stale > 0:
+            self.solver.pop(stale)
+            del self.stack[common:]
+
+        for c in reversed(path):
+            self.solver.push()
+            self.solver.add_assertion(pred_to_smt(c.predicate))
+            self.stack.append(c)
+
+        self.reused += common
+        self.sent += len(path)
+
+    def solve(self, asserts, query):
+        self.sync(asserts)
+        return self.solver.solve([Not(pred_to_smt(query))])
@@ -0,0 +1,483 @@
+# Copyright: see copyright.txt
+
+import ast
+import copy
+import logging
+
+from pyexsmt.symbolic_types.symbolic_object import SymbolicObject, to_pysmt
+from pyexsmt.symbolic_types.symbolic_int import SymbolicInteger
+from pyexsmt.symbolic_types.symbolic_bitvec import SymbolicBitVec
+
+from pysmt.shortcuts import *
+
+# Source rewriting passes applied by the Loader before the target runs. The
+# rewritten code calls back into this module, bound to RUNTIME in the
+# target's globals.
+#
+# Condition flattening: `and`, `or` and `not` in a condition call __bool__
+# on each operand, so `if a > 0 and b > 0 and c > 0` adds up to three
+# levels to the constraint tree. They are rewritten so that the operands
+# are combined into one symbolic And/Or and the if branches once.
+#
+#     if a > 0 and b > 0:   ->   if _pyexsmt.all_of(a > 0, lambda: b > 0):
+#
+# The operands after the first are only evaluated speculatively if they
+# can't have side effects: names, constants, arithmetic and comparisons.
+#
+# State merging: an `if` whose branches only assign variables is rewritten
+# so that, when its condition is symbolic, both branches are evaluated and
+# every variable they assign gets the value Ite(condition, then, else) at
+# the join point. The execution then goes on as one path instead of two.
+#
+#     if c:                        _merge_c1 = c
+#         x = x + 1                if _pyexsmt.should_merge(_merge_c1, 2):
+#     else:                            _merge_t1_x = x + 1
+#         x = 0                        _merge_e1_x = 0
+#                                      x, = _pyexsmt.ite(_merge_c1, _merge_t1_x, _merge_e1_x),
+#                                  elif _merge_c1:
+#                                      x = x + 1
+#                                  else:
+#                                      x = 0
+#
+# Evaluating the branch not taken must be harmless, so the branches may only
+# contain assignments to plain names of expressions that can't raise or
+# branch: no calls, no attributes or subscripts, no and/or, no division.
+
+RUNTIME = "_pyexsmt"
+
+# a merged variable makes every later query that mentions it larger; don't
+# merge variables that later branch conditions and returns read more often
+MAX_HOT_USES = 4
+# merges per execution, bounds how deeply the Ite terms can nest
+MAX_MERGES = 64
+
+# the operators every symbolic type implements (SymbolicInteger has no
+# bitwise operators)
+_PURE_BINOPS = (ast.Add, ast.Sub, ast.Mult)
+_PURE_UNARYOPS = (ast.UAdd, ast.USub)
+_CONDITION_BINOPS = _PURE_BINOPS + (ast.FloorDiv, ast.Mod, ast.BitAnd, ast.BitOr, ast.BitXor, ast.LShift, ast.RShift)
+_CONDITION_UNARYOPS = _PURE_UNARYOPS + (ast.Invert,)
+
+class ConditionStats:
+    """Counts the flattened conditions that were combined into a single
+       predicate or had to branch on their operands after all."""
+    def __init__(self):
+        self.flattened = 0
+        self.split = 0
+
+    def __str__(self):
+        return "%d conditions flattened, %d split" % (self.flattened, self.split)
+
+condition_stats = ConditionStats()
+
+class MergeStats:
+    """Counts the join points that were merged or left as two paths."""
+    def __init__(self):
+        self.merged = 0
+        self.declined = 0
+        self.fallbacks = 0
+        self.execution_merges = 0
+
+    def new_execution(self):
+        self.execution_merges = 0
+
+    def __str__(self):
+        return "%d joins merged, %d declined, %d values not mergeable" \
+               % (self.merged, self.declined, self.fallbacks)
+
+merge_stats = MergeStats()
+
+def instrument(source, filename, passes):
+    '''
+    source : python source of the target module
+    passes : names of the rewritings to apply, keys of PASSES
+    returns the code object of the rewritten module
+    '''
+    tree = ast.parse(source, filename)
+    for name in PASSES:
+        if name in passes:
+            tree = ast.fix_missing_locations(PASSES[name]().visit(tree))
+    return compile(tree, filename, "exec")
+
+# -- runtime, called from the instrumented code
+
+def all_of(first, *rest):
+    '''
+    first : value of the first operand of an `and`
+    rest : functions evaluating the other operands
+    returns a value with the truth value of the `and`
+    '''
+    return _combine(first, rest, And, False)
+
+def any_of(first, *rest):
+    '''
+    the same for an `or`
+    '''
+    return _combine(first, rest, Or, True)
+
+def negate(value):
+    '''
+    returns a value with the truth value of `not value`
+    '''
+    if isinstance(value, SymbolicObject) and _is_condition(value):
+        return SymbolicObject(Not(_condition(value)), concr=not value.get_concr_value())
+    return not value
+
+def _combine(first, rest, op, decisive):
+    # decisive is the truth value that decides the whole condition
+    terms = []
+    value = first
+    for i in range(len(rest) + 1):
+        if i > 0:
+            try:
+                value = rest[i - 1]()
+            except Exception:
+                # the operand may only be defined when the symbolic ones
+                # before it aren't decisive, e.g. `x != 0 and 10 // x > 1`:
+                # branch on them first, as the original code does
+                condition_stats.split += 1
+                if len(terms) > 0 and bool(_join(terms, op)) == decisive:
+                    return decisive
+                return _short_circuit(rest[i - 1:], decisive)
+        if isinstance(value, SymbolicObject) and _is_condition(value):
+            terms.append(value)
+        elif bool(value) == decisive:
+            # whatever the symbolic operands are
+            return decisive
+    if len(terms) == 0:
+        return not decisive
+    condition_stats.flattened += 1
+    return _join(terms, op)
+
+def _join(terms, op):
+    concr = [t.get_concr_value() for t in terms]
+    value = all(concr) if op is And else any(concr)
+    return SymbolicObject(op([_condition(t) for t in terms]), concr=value)
+
+def _short_circuit(operands, decisive):
+    for operand in operands:
+        if bool(operand()) == decisive:
+            return decisive
+    return not decisive
+
+def _is_condition(value):
+    t = value.expr.get_type()
+    return t.is_bool_type() or t.is_int_type() or t.is_bv_type()
+
+def should_merge(cond, uses):
+    '''
+    cond : value of the condition of the if
+    uses : how often later conditions and returns read the merged variables
+    returns True if both branches should be evaluated and merged
+    '''
+    if not isinstance(cond, SymbolicObject) or not _is_condition(cond):
+        # a concrete condition doesn't fork the path
+        return False
+    if uses > MAX_HOT_USES or merge_stats.execution_merges >= MAX_MERGES:
+        merge_stats.declined += 1
+        return False
+    merge_stats.merged += 1
+    merge_stats.execution_merges += 1
+    return True
+
+def ite(cond, then_value, else_value):
+    '''
+    returns the value of a variable after the join point: then_value if
+    cond holds, else_value otherwise
+    '''
+    if then_value is else_value:
+        return then_value
+    if not isinstance(then_value, SymbolicObject) and not isinstance(else_value, SymbolicObject) \
+       and type(then_value) == type(else_value) and then_value == else_value:
+        return then_value
+
+    a = to_term(then_value)
+    b = to_term(else_value)
+    if a is not None and b is not None and a.get_type() != b.get_type():
+        # an int on one side of a bit-vector takes its width
+        a = to_term(then_value, b.get_type())
+        b = to_term(else_value, a.get_type())
+    if a is None or b is None or a.get_type() != b.get_type():
+        # e.g. an int on one side and None on the other: take the branch
+        # after all, so that the path condition stays exact
+        merge_stats.fallbacks += 1
+        logging.debug("MERGE: can't merge %r and %r", then_value, else_value)
+        return then_value if cond else else_value
+
+    taken = cond.get_concr_value()
+    concr = _concr(then_value if taken else else_value)
+    expr = Ite(_condition(cond), a, b)
+    t = expr.get_type()
+    if t.is_int_type():
+        return SymbolicInteger(expr, concr=concr)
+    if t.is_bv_type():
+        return SymbolicBitVec(expr, concr=concr)
+    return SymbolicObject(expr, concr=concr)
+
+def _condition(cond):
+    t = cond.expr.get_type()
+    if t.is_int_type():
+        return NotEquals(cond.expr, Int(0))
+    if t.is_bv_type():
+        return NotEquals(cond.expr, BV(0, t.width))
+    return cond.expr
+
+def to_term(value, sort=None):
+    '''
+    returns the pySMT term of an int, bool or symbolic value, None for
+    anything else
+    sort : pySMT type to build an int in when it is a bit-vector type
+    '''
+    if isinstance(value, SymbolicObject):
+        return value.expr if _is_condition(value) else None
+    if isinstance(value, bool):
+        return Bool(value)
+    if isinstance(value, int):
+        if sort is not None and sort.is_bv_type():
+            return BV(value % (1 << sort.width), sort.width)
+        return to_pysmt(value)
+    return None
+
+def _concr(value):
+    if isinstance(value, SymbolicObject):
+        return value.concr
+    return value
+
+# -- rewriting
+
+class FlattenTransformer(ast.NodeTransformer):
+    """Rewrites the and, or and not in the conditions of ifs, whiles,
+       conditional expressions and asserts."""
+    def visit_If(self, node):
+        self.generic_visit(node)
+        node.test = _flatten(node.test)
+        return node
+
+    visit_While = visit_If
+    visit_IfExp = visit_If
+    visit_Assert = visit_If
+
+def _flatten(expr):
+    if isinstance(expr, ast.BoolOp):
+        if not all(_pure_condition(e) for e in expr.values[1:]):
+            return expr
+        operands = [_flatten(expr.values[0])]
+        for e in expr.values[1:]:
+            operands.append(ast.Lambda(args=_no_arguments(), body=_flatten(e)))
+        function = "all_of" if isinstance(expr.op, ast.And) else "any_of"
+        return ast.copy_location(_call(function, operands), expr)
+    if isinstance(expr, ast.UnaryOp) and isinstance(expr.op, ast.Not):
+        return ast.copy_location(_call("negate", [_flatten(expr.operand)]), expr)
+    return expr
+
+def _no_arguments():
+    return ast.arguments(posonlyargs=[], args=[], vararg=None, kwonlyargs=[], \
+                         kw_defaults=[], kwarg=None, defaults=[])
+
+
+class MergeTransformer(ast.NodeTransformer):
+    """Rewrites the mergeable ifs in the functions of a module."""
+    def __init__(self):
+        self.count = 0
+        # (line, name) of the variables read by conditions and returns
+        # of the function being rewritten
+        self.uses = []
+
+    def visit_FunctionDef(self, node):
+        outer = self.uses
+        self.uses = _hot_uses(node)
+        args = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        defined = set(a.arg for a in args)
+        for a in (node.args.vararg, node.args.kwarg):
+            if a is not None:
+                defined.add(a.arg)
+        node.body = self._block(node.body, defined)
+        self.uses = outer
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def _block(self, statements, defined):
+        '''
+        defined : names certainly bound when the block starts
+        '''
+        defined = set(defined)
+        body = []
+        for s in statements:
+            if isinstance(s, ast.If):
+                merged = self._merge(s, defined)
+                if merged is not None:
+                    rewritten, assigned = merged
+                    body.extend(rewritten)
+                    defined |= assigned
+                    continue
+            if isinstance(s, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                s = self.visit(s)
+            else:
+                for field in ("body", "orelse", "finalbody"):
+                    if isinstance(getattr(s, field, None), list):
+                        setattr(s, field, self._block(getattr(s, field), defined))
+                for handler in getattr(s, "handlers", []):
+                    handler.body = self._block(handler.body, defined)
+            body.append(s)
+            defined |= _bound(s)
+        return body
+
+    def _merge(self, node, defined):
+        # returns (statements, names bound on both sides), or None if the
+        # if can't be merged
+        if not _mergeable(node.body) or not _mergeable(node.orelse):
+            return None
+        then_assigned = _assigned(node.body)
+        else_assigned = _assigned(node.orelse)
+        names = then_assigned + [n for n in else_assigned if n not in then_assigned]
+        if len(names) == 0:
+            return None
+        for n in names:
+            if (n not in then_assigned or n not in else_assigned) and n not in defined:
+                # the unassigned side would read an unbound variable
+                return None
+
+        self.count += 1
+        cond = "_merge_c%d" % self.count
+        end = getattr(node, "end_lineno", node.lineno)
+        uses = sum(1 for line, n in self.uses if line > end and n in names)
+
+        merged = []
+        then_values = self._rename(node.body, "_merge_t%d_" % self.count, merged)
+        else_values = self._rename(node.orelse, "_merge_e%d_" % self.count, merged)
+        values = [_call("ite", [_load(cond), then_values.get(n, _load(n)), else_values.get(n, _load(n))]) \
+                  for n in names]
+        merged.append(ast.Assign(targets=[ast.Tuple([_store(n) for n in names], ast.Store())], \
+                                 value=ast.Tuple(values, ast.Load())))
+
+        original = ast.If(test=_load(cond), body=node.body, orelse=node.orelse)
+        rewritten = [ast.Assign(targets=[_store(cond)], value=node.test),
+                     ast.If(test=_call("should_merge", [_load(cond), ast.Constant(uses)]), \
+                            body=merged, orelse=[original])]
+        for s in rewritten:
+            ast.copy_location(s, node)
+        logging.debug("MERGE: if at line %d assigns %s, %d later uses", node.lineno, names, uses)
+        return rewritten, set(then_assigned) & set(else_assigned)
+
+    def _rename(self, statements, prefix, out):
+        # appends to out the statements computing the values the branch
+        # assigns into fresh names; returns {name : load of its value}
+        env = {}
+        for s in statements:
+            if isinstance(s, ast.Pass):
+                continue
+            if isinstance(s, ast.AugAssign):
+                name = s.target.id
+                value = ast.BinOp(left=env.get(name, _load(name)), op=s.op, right=_substitute(s.value, env))
+            else:
+                name = s.targets[0].id
+                value = _substitute(s.value, env)
+            temp = prefix + name
+            out.append(ast.copy_location(ast.Assign(targets=[_store(temp)], value=value), s))
+            env[name] = _load(temp)
+        return env
+
+def _mergeable(statements):
+    for s in statements:
+        if isinstance(s, ast.Pass):
+            continue
+        if isinstance(s, ast.Assign):
+            if len(s.targets) != 1 or not isinstance(s.targets[0], ast.Name) or not _pure(s.value):
+                return False
+        elif isinstance(s, ast.AugAssign):
+            if not isinstance(s.target, ast.Name) or not isinstance(s.op, _PURE_BINOPS) or not _pure(s.value):
+                return False
+        else:
+            return False
+    return True
+
+def _pure_condition(expr):
+    # an operand of a flattened condition may raise (see _combine), and
+    # its own and, or and not are flattened as well
+    if isinstance(expr, ast.BoolOp):
+        return all(_pure_condition(e) for e in expr.values)
+    if isinstance(expr, ast.UnaryOp) and isinstance(expr.op, ast.Not):
+        return _pure_condition(expr.operand)
+    return _pure(expr, True)
+
+def _pure(expr, condition=False):
+    # True if expr can't raise, branch or have side effects, whatever the
+    # values of the variables it reads
+    binops = _CONDITION_BINOPS if condition else _PURE_BINOPS
+    unaryops = _CONDITION_UNARYOPS if condition else _PURE_UNARYOPS
+    if isinstance(expr, (ast.Name, ast.Constant)):
+        return True
+    if isinstance(expr, ast.BinOp):
+        return isinstance(expr.op, binops) and _pure(expr.left, condition) and _pure(expr.right, condition)
+    if isinstance(expr, ast.UnaryOp):
+        return isinstance(expr.op, unaryops) and _pure(expr.operand, condition)
+    if isinstance(expr, ast.Compare):
+        # a chained comparison calls __bool__ on the first result
+        return len(expr.ops) == 1 and _pure(expr.left, condition) and _pure(expr.comparators[0], condition)
+    return False
+
+def _assigned(statements):
+    names = []
+    for s in statements:
+        target = s.target if isinstance(s, ast.AugAssign) else s.targets[0] if isinstance(s, ast.Assign) else None
+        if target is not None and target.id not in names:
+            names.append(target.id)
+    return names
+
+def _bound(statement):
+    # names a statement certainly binds when it completes normally
+    names = set()
+    if isinstance(statement, ast.Assign):
+        for target in statement.targets:
+            for n in ast.walk(target):
+                if isinstance(n, ast.Name):
+                    names.add(n.id)
+    elif isinstance(statement, (ast.AugAssign, ast.AnnAssign)) and isinstance(statement.target, ast.Name):
+        if isinstance(statement, ast.AugAssign) or statement.value is not None:
+            names.add(statement.target.id)
+    elif isinstance(statement, (ast.Import, ast.ImportFrom)):
+        for alias in statement.names:
+            names.add((alias.asname or alias.name).split(".")[0])
+    elif isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        names.add(statement.name)
+    return names
+
+def _hot_uses(function):
+    uses = []
+    for node in ast.walk(function):
+        if isinstance(node, (ast.If, ast.While, ast.IfExp, ast.Assert)):
+            expr = node.test
+        elif isinstance(node, ast.Return) and node.value is not None:
+            expr = node.value
+        else:
+            continue
+        for n in ast.walk(expr):
+            if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load):
+                uses.append((n.lineno, n.id))
+    return uses
+
+class _Substitute(ast.NodeTransformer):
+    def __init__(self, env):
+        self.env = env
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.env:
+            return copy.copy(self.env[node.id])
+        return node
+
+def _substitute(expr, env):
+    return _Substitute(env).visit(copy.deepcopy(expr))
+
+# applied in this order
+PASSES = {"flatten": FlattenTransformer, "merge": MergeTransformer}
+
+def _load(name):
+    return ast.Name(id=name, ctx=ast.Load())
+
+def _store(name):
+    return ast.Name(id=name, ctx=ast.Store())
+
+def _call(function, args):
+    return ast.Call(func=ast.Attribute(value=_load(RUNTIME), attr=function, ctx=ast.Load()), \
+                    args=args, keywords=[])
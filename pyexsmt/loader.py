@@ -6,6 +6,9 @@ import re
 import os
 import sys
 import builtins
+import importlib.util
+import types
+from pyexsmt import instrument
 from pyexsmt.invocation import FunctionInvocation
 from pyexsmt.symbolic_types import SymbolicInteger, get_symbolic
 
@@ -15,7 +18,12 @@ from pyexsmt.symbolic_types import SymbolicInteger, get_symbolic
 builtins.len = (lambda x: x.__len__())
 
 class Loader:
-    def __init__(self, filename, entry):
+    def __init__(self, filename, entry, int_encoding=None, passes=()):
+        # None, or the BitVec to use for integer arguments
+        self.int_encoding = int_encoding
+        # rewritings to apply to the target, see pyexsmt.instrument
+        self.passes = passes
+        self._instrumented_code = None
         self._file_name = os.path.basename(filename)
         self._file_name = self._file_name[:-3]
         if (entry == ""):
@@ -30,6 +38,9 @@ class Loader:
     def get_entry(self):
         return self._entry_point
     
+    def get_arguments(self):
+        return list(inspect.signature(self.app.__dict__[self._entry_point]).parameters)
+
     def create_invocation(self):
         inv = FunctionInvocation(self._execute,self._reset_callback)
         func = self.app.__dict__[self._entry_point]
@@ -48,13 +59,18 @@ class Loader:
                 elif f in inv.get_names():
                     raise ImportError("Argument " + f + " defined in both @concrete and @symbolic")
                 else:
+                    if self.int_encoding is not None and type(v) is int:
+                        v = self.int_encoding
                     s = get_symbolic(v)
                     if (s == None):
                         raise ImportError("Error at argument " + f + " of entry point " + self._entry_point + " : no corresponding symbolic type found for type " + str(type(v)))
                     Loader._init_arg_symbolic(inv, f, s)
         for a in argspec.parameters:
             if not a in inv.get_names():
-                Loader._init_arg_symbolic(inv, a, SymbolicInteger)
+                if self.int_encoding is not None:
+                    Loader._init_arg_symbolic(inv, a, get_symbolic(self.int_encoding))
+                else:
+                    Loader._init_arg_symbolic(inv, a, SymbolicInteger)
         return inv
 
     # need these here (rather than inline above) to correctly capture values in lambda
@@ -82,12 +98,30 @@ class Loader:
         try:
             if not firstpass and self._file_name in sys.modules:
                 del sys.modules[self._file_name]
-            self.app = __import__(self._file_name)
+            if len(self.passes) > 0:
+                self.app = self._import_instrumented()
+                instrument.merge_stats.new_execution()
+            else:
+                self.app = __import__(self._file_name)
             if not self._entry_point in self.app.__dict__ or not callable(self.app.__dict__[self._entry_point]):
                 raise ImportError("File %s.py doesn't contain a function named %s"
                                   % (self._file_name, self._entry_point))
         except Exception as arg:
-            raise ImportError("Couldn't import " + self._file_name + "\n" + arg)
+            raise ImportError("Couldn't import " + self._file_name + "\n" + str(arg))
+
+    def _import_instrumented(self):
+        spec = importlib.util.find_spec(self._file_name)
+        if spec is None or spec.origin is None:
+            raise ImportError("No module named " + self._file_name)
+        if self._instrumented_code is None:
+            with open(spec.origin) as f:
+                self._instrumented_code = instrument.instrument(f.read(), spec.origin, self.passes)
+        module = types.ModuleType(self._file_name)
+        module.__file__ = spec.origin
+        module.__dict__[instrument.RUNTIME] = instrument
+        sys.modules[self._file_name] = module
+        exec(self._instrumented_code, module.__dict__)
+        return module
 
     def _execute(self, **args):
         return self.app.__dict__[self._entry_point](**args)
@@ -103,14 +137,14 @@ class Loader:
             print("Test Passed <--- %s" % self._file_name)
             return True
 
-def loaderFactory(filename, entry):
+def loaderFactory(filename, entry, int_encoding=None, passes=()):
     if not os.path.isfile(filename) or not re.search(".py$", filename):
         print("Please provide a Python file to load")
         return None
     try:
         directory = os.path.dirname(filename)
         sys.path = [directory] + sys.path
-        ret = Loader(filename, entry)
+        ret = Loader(filename, entry, int_encoding, passes)
         return ret
     except ImportError:
         sys.path = sys.path[1:]
@@ -0,0 +1,45 @@
+# Copyright: see copyright.txt
+
+import json
+import time
+
+from pyexsmt import smtlib
+
+class JsonLinesSink:
+    """Streams the executions recorded in a Result to a file, one JSON
+       record per line. Records are buffered and written at most every
+       interval seconds, like the checkpoint journal."""
+    def __init__(self, filename, interval=5, path_conditions=True):
+        '''
+        path_conditions : also write the path condition of every execution,
+        as SMT-LIB text (see pyexsmt.smtlib)
+        '''
+        self.file = open(filename, "w")
+        self.buffer = []
+        self.interval = interval
+        self.path_conditions = path_conditions
+        self.last_flush = time.time()
+
+    def write(self, execution):
+        '''
+        execution : result.Execution
+        '''
+        record = {"execution": execution.number, "inputs": dict(execution.inputs), \
+                  "effect": execution.value, "time": round(execution.elapsed, 6)}
+        if self.path_conditions:
+            record["path"] = smtlib.dumps([execution.path_condition()])
+        # values JSON can't represent are written as their repr
+        self.buffer.append(json.dumps(record, default=repr) + "\n")
+        self.flush()
+
+    def flush(self, force=False):
+        if not force and time.time() - self.last_flush < self.interval:
+            return
+        self.file.write("".join(self.buffer))
+        self.file.flush()
+        self.buffer = []
+        self.last_flush = time.time()
+
+    def close(self):
+        self.flush(True)
+        self.file.close()
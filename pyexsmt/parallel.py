@@ -0,0 +1,274 @@
+# Copyright: see copyright.txt
+
+import logging
+import multiprocessing
+import pickle
+import queue
+import time
+
+from pyexsmt import pred_to_smt, get_concr_value, set_concr_values, get_symbolic_from_expr, \
+                    uninterp_func_pair, parse_int_encoding
+from pyexsmt import smtlib
+from pyexsmt import portfolio
+from pyexsmt import summary
+from pyexsmt.explore import ExplorationEngine
+from pyexsmt.loader import loaderFactory
+from pyexsmt.path_to_constraint import PathToConstraint
+from pyexsmt.symbolic_types import symbolic_object
+from pyexsmt.symbolic_types import SymbolicObject
+
+from pysmt.shortcuts import *
+from pysmt.exceptions import SolverReturnedUnknownResultError
+
+# the outcome of a task whose query the solver couldn't decide, or on which
+# the worker failed; the constraint is deferred like ExplorationEngine does
+UNKNOWN = "unknown"
+
+class ExplorationWorker:
+    """Owns a solver and a loaded copy of the target module. Solves the
+       path prefixes it is handed and executes the target on the model."""
+    def __init__(self, target, solver="z3", max_depth=0, mod=None, query_timeout=0):
+        '''
+        target : (filename, entry, uninterp, int_encoding, passes) as given on the
+        command line
+        mod : SMT-LIB text (see pyexsmt.smtlib) of the path filter, or None
+        query_timeout : seconds, 0 for no limit
+        '''
+        filename, entry, uninterp, int_encoding, passes = target
+        app = loaderFactory(filename, entry, parse_int_encoding(int_encoding), passes)
+        if app is None:
+            raise ImportError("Worker couldn't load " + filename)
+        self.invocation = app.create_invocation()
+        self.funcs = uninterp_func_pair(uninterp, app.get_file())
+        self.symbolic_inputs = {}
+        for n in self.invocation.get_names():
+            self.symbolic_inputs[n] = self.invocation.create_arg_value(n)
+
+        self.max_depth = max_depth
+        self.mod = None if mod is None else smtlib.loads(mod)[0]
+
+        self.solver = portfolio.create_solver(solver, query_timeout)
+        summary.SOLVER = portfolio.backends(solver)[0]
+        symbolic_object.SymbolicObject.SOLVER = self.solver
+
+    def run(self, task):
+        '''
+        task : SMT-LIB text of the assumptions to solve
+        returns None if they are unsat, UNKNOWN if the solver couldn't tell,
+        otherwise the outcome of executing the target on the model:
+        (text, results, inputs, symbolic_effect, effect) where text is the
+        SMT-LIB dump of the branch predicates taken (followed by the effect,
+        if it is symbolic)
+        '''
+        try:
+            if not self.solver.solve(smtlib.loads(task)):
+                return None
+        except SolverReturnedUnknownResultError:
+            return UNKNOWN
+
+        path = PathToConstraint(lambda c : None)
+        path.max_depth = self.max_depth
+        path.mod = self.mod
+        path.reset(None)
+        symbolic_object.SymbolicObject.SI = path
+
+        set_concr_values(self.symbolic_inputs.values())
+        inputs = [(k, get_concr_value(v)) for k, v in self.symbolic_inputs.items()]
+        try:
+            ret = self.invocation.call_function(self.symbolic_inputs, self.funcs)
+        except Exception:
+            ret = None
+
+        exprs = []
+        results = []
+        tmp = path.current_constraint
+        while tmp.predicate is not None:
+            exprs.append(tmp.predicate.symtype.expr)
+            results.append(tmp.predicate.result)
+            tmp = tmp.parent
+        exprs.reverse()
+        results.reverse()
+
+        symbolic_effect = isinstance(ret, SymbolicObject)
+        effect = get_concr_value(ret)
+        if symbolic_effect:
+            exprs.append(ret.expr)
+        return (smtlib.dumps(exprs), results, inputs, symbolic_effect, effect)
+
+def _worker_main(target, solver, max_depth, mod, query_timeout, tasks, results):
+    try:
+        worker = ExplorationWorker(target, solver, max_depth, mod, query_timeout)
+    except Exception as error:
+        logging.error("Worker failed to start: %s", error)
+        return
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, text = task
+        try:
+            outcome = worker.run(text)
+        except Exception as error:
+            logging.error("Worker failed on task %d: %s", task_id, error)
+            outcome = UNKNOWN
+        results.put((task_id, _picklable(outcome)))
+
+def _picklable(outcome):
+    # objects of the target module's classes don't survive the trip back
+    if outcome is None or outcome == UNKNOWN:
+        return outcome
+    text, results, inputs, symbolic_effect, effect = outcome
+    try:
+        pickle.dumps(effect)
+    except Exception:
+        logging.warning("Can't send return value %s, sending its repr", repr(effect))
+        effect = repr(effect)
+    return (text, results, inputs, symbolic_effect, effect)
+
+class ParallelExplorationEngine(ExplorationEngine):
+    """Explores with a pool of worker processes pulling unsolved constraints
+       from a shared queue. The tree and the Result stay in this process."""
+    def __init__(self, funcinv, target, solver="z3", jobs=2, strategy=None, query_timeout=0):
+        '''
+        target : (filename, entry, uninterp, int_encoding, passes), used by the workers to
+        load their own copy of the target module
+        '''
+        ExplorationEngine.__init__(self, funcinv, solver=solver, strategy=strategy, query_timeout=query_timeout)
+        self.target = target
+        self.jobs = jobs
+        self.query_timeout = query_timeout
+
+    def explore_iter(self, max_iterations=0, max_depth=0, funcs=[], mod=None, time_budget=0):
+        # executions are yielded in the order the workers complete them
+        self.path.max_depth = max_depth
+        self.path.mod = mod
+        deadline = time.time() + time_budget if time_budget > 0 else None
+        self.path.deadline = deadline
+
+        iterations = self.result.num_executions
+        if iterations == 0:
+            if not self._timed_execution(funcs):
+                self._finish()
+                return
+            iterations = 1
+            yield self.result.last
+        # the paths the workers send back are replayed whatever the time
+        self.path.deadline = None
+
+        if max_iterations != 0 and iterations >= max_iterations:
+            logging.debug("Maximum number of iterations reached, terminating")
+            self._finish()
+            return
+
+        ctx = multiprocessing.get_context("spawn")
+        tasks = ctx.Queue()
+        results = ctx.Queue()
+        mod_text = None if mod is None else smtlib.dumps([mod])
+        workers = [ctx.Process(target=_worker_main, \
+                               args=(self.target, self.solver_name, max_depth, mod_text, \
+                                     self.query_timeout, tasks, results)) \
+                   for _ in range(self.jobs)]
+        for w in workers:
+            w.start()
+
+        in_flight = {}
+        try:
+            while True:
+                if deadline is not None and time.time() >= deadline:
+                    logging.info("Time budget (%ss) exhausted, terminating", time_budget)
+                    self.result.timed_out = True
+                    break
+
+                # keep every worker busy, with one task of slack each
+                while len(in_flight) < 2 * self.jobs:
+                    task = self._next_task()
+                    if task is None:
+                        break
+                    selected, text = task
+                    in_flight[selected.id] = selected
+                    tasks.put((selected.id, text))
+
+                if len(in_flight) == 0 and not self._retry_deferred():
+                    logging.info("EXPLORATION COMPLETE")
+                    break
+
+                try:
+                    task_id, outcome = results.get(timeout=1)
+                except queue.Empty:
+                    if not any(w.is_alive() for w in workers):
+                        logging.error("All workers died, returning partial result")
+                        break
+                    continue
+
+                if not self._complete(in_flight.pop(task_id), outcome):
+                    continue
+                iterations += 1
+                self.num_processed_constraints += 1
+                yield self.result.last
+
+                if max_iterations != 0 and iterations >= max_iterations:
+                    logging.debug("Maximum number of iterations reached, terminating")
+                    break
+        finally:
+            for w in workers:
+                w.terminate()
+            for w in workers:
+                w.join()
+
+            # whatever was still being solved goes back to pending
+            for c in in_flight.values():
+                c.processed = False
+                self.constraints_to_solve.add(c)
+            self._finish()
+
+    # private
+
+    def _next_task(self):
+        '''
+        returns the next unprocessed constraint and the SMT-LIB text of its
+        query, or None if nothing is queued
+        '''
+        while len(self.constraints_to_solve) > 0:
+            selected = self.constraints_to_solve.pop()
+            if selected.processed:
+                continue
+            logging.debug("DISPATCHING CONSTRAINT: %r", selected)
+            asserts, query = selected.get_asserts_and_query()
+            assumptions = [pred_to_smt(p) for p in asserts] + [Not(pred_to_smt(query))]
+            return selected, smtlib.dumps(assumptions)
+        return None
+
+    def _complete(self, selected, outcome):
+        '''
+        record the outcome a worker sent back for selected
+        returns True if it was an execution
+        '''
+        if outcome == UNKNOWN:
+            self._defer(selected)
+            return False
+        if outcome is None:
+            selected.infeasible = "unsat"
+        else:
+            self._merge(outcome)
+        # after the records of the execution, see ExplorationEngine.explore_iter
+        if self.checkpoint is not None:
+            self.checkpoint.done(selected)
+            self.checkpoint.flush()
+        return outcome is not None
+
+    def _merge(self, outcome):
+        text, results, inputs, symbolic_effect, effect = outcome
+        exprs = smtlib.loads(text)
+
+        # replaying the branches through which_branch deduplicates them
+        # against the tree and queues the new ones
+        self.path.reset(None)
+        for expr, result in zip(exprs, results):
+            self.path.which_branch(result, SymbolicObject(expr))
+
+        self.result.record_inputs(dict(inputs))
+        logging.info("USING INPUTS: %s", self.result.current_inputs)
+        ret = get_symbolic_from_expr(exprs[-1]) if symbolic_effect else effect
+        self.result.record_effect(ret, effect)
+        self._checkpoint_execution(ret)
+        self.constraints_to_solve.executed(self.path.current_constraint)
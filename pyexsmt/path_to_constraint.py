@@ -1,13 +1,21 @@
 # Copyright: see copyright.txt
 
 import logging
+import time
 
 from pyexsmt.predicate import Predicate
 from pyexsmt.constraint import Constraint
+from pyexsmt.incremental import IncrementalSolver
 
 from pyexsmt import pred_to_smt
+from pyexsmt.symbolic_types import SymbolicObject
 from pysmt.shortcuts import *
 
+class TimeBudgetExhausted(BaseException):
+    """Raised by which_branch once the deadline has passed, to stop the
+       execution in progress. It isn't an Exception, so that the target's
+       own handlers don't catch it."""
+
 class PathToConstraint:
     def __init__(self, add):
         self.constraints = {}
@@ -17,6 +25,18 @@ class PathToConstraint:
         self.expected_path = None
         self.max_depth = 0
         self.mod = None
+        # time.time() after which executions are stopped, or None
+        self.deadline = None
+        # solver with mod asserted at the bottom of its stack and the
+        # current path above it, see _mod_allows
+        self.mod_solver = None
+        self.mod_asserted = None
+        # (constraint id, Predicate) of the branches mod ruled out
+        self.mod_pruned = set()
+        self.num_pruned = 0
+        self.num_constraints = 0
+        # (expr, result) -> Predicate, shared by all the constraints on it
+        self.predicates = {}
 
     def reset(self,expected):
         self.current_constraint = self.root_constraint
@@ -33,23 +53,24 @@ class PathToConstraint:
         """ This function acts as instrumentation.
         Branch can be either True or False."""
 
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise TimeBudgetExhausted()
+
         if self.max_depth > 0 and self.current_constraint.get_length() >= self.max_depth:
             logging.debug("Max Depth (%d) Reached", self.max_depth)
             return
 
         # add both possible predicate outcomes to constraint (tree)
-        p = Predicate(symbolic_type, branch)
-        p.negate()
-        cneg = self.current_constraint.find_child(p)
-        p.negate()
+        p = self.predicate(symbolic_type, branch)
+        cneg = self.current_constraint.find_child(Predicate(symbolic_type, not branch))
         c = self.current_constraint.find_child(p)
 
         if c is None:
-            asserts = [pred_to_smt(p) for p in self.current_constraint.get_asserts()]
-            if self.mod is not None and not is_sat(And(self.mod, pred_to_smt(p), *asserts)):
+            if self.mod is not None and not self._mod_allows(p):
                 logging.debug("Path pruned by mod (%s): %s %s", self.mod, c, p)
                 return
             c = self.current_constraint.add_child(p)
+            self.num_constraints += 1
 
             # we add the new constraint to the queue of the engine for later processing
             logging.debug("New constraint: %s", c)
@@ -77,3 +98,32 @@ class PathToConstraint:
             logging.debug("Processed constraint: %s", c)
 
         self.current_constraint = c
+
+    def predicate(self, symbolic_type, branch):
+        '''
+        returns the one Predicate of the tree for this branch of this
+        expression, wherever it occurs (e.g. on every iteration of a loop)
+        '''
+        key = (symbolic_type.expr, branch)
+        p = self.predicates.get(key)
+        if p is None:
+            # don't keep the concrete values of the execution alive
+            p = Predicate(SymbolicObject(symbolic_type.expr), branch)
+            self.predicates[key] = p
+        return p
+
+    def _mod_allows(self, p):
+        key = (self.current_constraint.id, p)
+        if key in self.mod_pruned:
+            return False
+        if self.mod_asserted is not self.mod:
+            solver = Solver()
+            solver.add_assertion(self.mod)
+            self.mod_solver = IncrementalSolver(solver)
+            self.mod_asserted = self.mod
+            self.mod_pruned = set()
+        self.mod_solver.sync_to(self.current_constraint)
+        sat = self.mod_solver.solver.solve([pred_to_smt(p)])
+        if not sat:
+            self.mod_pruned.add(key)
+        return sat
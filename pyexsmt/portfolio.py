@@ -0,0 +1,253 @@
+# Copyright: see copyright.txt
+
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing.connection import wait
+
+from pyexsmt import smtlib
+from pyexsmt.cache import CachedModel
+
+from pysmt.shortcuts import *
+from pysmt.exceptions import SolverReturnedUnknownResultError
+
+PORTFOLIO = "portfolio:"
+
+# seconds a solver that lost a race may go on with its query before it is
+# restarted; its late answer is dropped
+RESTART_GRACE = 1.0
+
+def backends(name):
+    '''
+    name : "z3" or "portfolio:z3,cvc4,msat"
+    returns the list of pySMT solver names it stands for
+    '''
+    if name.startswith(PORTFOLIO):
+        names = []
+        for n in name[len(PORTFOLIO):].split(","):
+            if n not in names:
+                names.append(n)
+        return names
+    return [name]
+
+def create_solver(name, query_timeout=0):
+    '''
+    returns a pySMT solver, or a PortfolioSolver if name lists several
+    query_timeout : seconds, 0 for no limit
+    '''
+    if name.startswith(PORTFOLIO):
+        return PortfolioSolver(backends(name), query_timeout)
+    return Solver(name, solver_options=_options(name, query_timeout))
+
+def _options(name, query_timeout):
+    if query_timeout <= 0:
+        return {}
+    if name == "z3":
+        return {"timeout": int(query_timeout * 1000)}
+    logging.warning("Query timeouts are only supported by z3, ignoring for %s", name)
+    return {}
+
+def _backend_main(name, query_timeout, conn):
+    solver = Solver(name, solver_options=_options(name, query_timeout))
+    while True:
+        try:
+            qid, text = conn.recv()
+        except EOFError:
+            return
+        try:
+            assumptions = smtlib.loads(text)
+            if solver.solve(assumptions):
+                symbols = set()
+                for a in assumptions:
+                    symbols.update(a.get_free_variables())
+                values = [EqualsOrIff(s, solver.get_value(s)) for s in sorted(symbols, key=lambda s: s.symbol_name())]
+                conn.send((qid, True, smtlib.dumps(values)))
+            else:
+                conn.send((qid, False, None))
+        except Exception as error:
+            logging.debug("%s gave up: %s", name, error)
+            conn.send((qid, None, None))
+
+class PortfolioSolver:
+    """Races several solvers, each in its own process, on every query and
+       takes the first definite answer. Solvers still busy with a query that
+       was already answered get RESTART_GRACE seconds to finish it before
+       they are killed and restarted, checked for by a thread of their own.
+       Models come back as SMT-LIB values, so the portfolio also stands in
+       for the solver as SymbolicObject.SOLVER."""
+    def __init__(self, names, query_timeout=0):
+        self.names = names
+        self.query_timeout = query_timeout
+        self.ctx = multiprocessing.get_context("spawn")
+        # name -> (process, connection)
+        self.backends = {}
+        # name -> number of queries sent and not answered yet
+        self.outstanding = {}
+        # name -> when it lost a race it was still running
+        self.lost = {}
+        # held while talking to the backends
+        self.lock = threading.Lock()
+        # (thread, event that stops it) reaping in the background
+        self.reaper = None
+        self._open()
+        self.qids = itertools.count()
+        self.model = None
+        self.last_result = None
+        self.wins = dict((n, 0) for n in names)
+        self.unknown = 0
+        # solves queries that the model can't be shipped back for
+        self.local = None
+
+    def solve(self, assumptions=[]):
+        '''
+        assumptions : [FNode] to be satisfied together
+        returns True or False, raises SolverReturnedUnknownResultError if
+        no solver could tell
+        '''
+        assumptions = list(assumptions)
+        symbols = set()
+        for a in assumptions:
+            symbols.update(a.get_free_variables())
+        if any(s.symbol_type().is_function_type() for s in symbols):
+            # a model of an uninterpreted function has no SMT-LIB value
+            return self._solve_locally(assumptions)
+
+        with self.lock:
+            if len(self.backends) == 0:
+                self._open()
+            self._reap()
+            return self._race(assumptions)
+
+    def get_value(self, expr):
+        return self.model.get_value(expr)
+
+    def get_py_value(self, expr):
+        return self.model.get_py_value(expr)
+
+    def close(self):
+        '''
+        Stop the backend processes; the next query starts them again
+        '''
+        with self.lock:
+            for process, conn in self.backends.values():
+                conn.close()
+                process.terminate()
+                process.join()
+            self.backends = {}
+            self.lost = {}
+            reaper, self.reaper = self.reaper, None
+        if reaper is not None:
+            thread, stop = reaper
+            stop.set()
+            thread.join()
+
+    def __str__(self):
+        s = ", ".join("%s %d wins" % (n, self.wins[n]) for n in self.names)
+        return s + ", %d unknown" % self.unknown
+
+    # private
+
+    def _open(self):
+        for n in self.names:
+            self._start(n)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._reap_periodically, args=(stop,))
+        thread.daemon = True
+        thread.start()
+        self.reaper = (thread, stop)
+
+    def _race(self, assumptions):
+        qid = next(self.qids)
+        text = smtlib.dumps(assumptions)
+        for n in self.names:
+            self.backends[n][1].send((qid, text))
+            self.outstanding[n] += 1
+
+        waiting = dict((self.backends[n][1], n) for n in self.names)
+        while len(waiting) > 0:
+            for conn in wait(list(waiting)):
+                name = waiting.pop(conn)
+                try:
+                    answer_qid, sat, values = conn.recv()
+                except EOFError:
+                    logging.warning("Solver %s died, restarting it", name)
+                    self._start(name)
+                    continue
+                self.outstanding[name] -= 1
+                if answer_qid != qid:
+                    waiting[conn] = name
+                    continue
+                if sat is None:
+                    continue
+                logging.debug("PORTFOLIO: %s answered first (%s)", name, sat)
+                self.wins[name] += 1
+                now = time.time()
+                for n in waiting.values():
+                    self.lost.setdefault(n, now)
+                return self._answer(sat, values)
+
+        self.unknown += 1
+        self.last_result = None
+        raise SolverReturnedUnknownResultError
+
+    def _answer(self, sat, values):
+        self.last_result = sat
+        if sat:
+            assignment = dict(e.args() for e in smtlib.loads(values))
+            self.model = CachedModel(assignment)
+        return sat
+
+    def _solve_locally(self, assumptions):
+        if self.local is None:
+            self.local = Solver(self.names[0], solver_options=_options(self.names[0], self.query_timeout))
+        sat = self.local.solve(assumptions)
+        self.wins[self.names[0]] += 1
+        self.last_result = sat
+        self.model = self.local
+        return sat
+
+    def _start(self, name):
+        parent, child = self.ctx.Pipe()
+        process = self.ctx.Process(target=_backend_main, args=(name, self.query_timeout, child))
+        process.daemon = True
+        process.start()
+        child.close()
+        self.backends[name] = (process, parent)
+        self.outstanding[name] = 0
+        self.lost.pop(name, None)
+
+    def _reap_periodically(self, stop):
+        # so that a lost race doesn't go on using a CPU while no query is made
+        while not stop.wait(RESTART_GRACE / 2):
+            with self.lock:
+                if not stop.is_set():
+                    self._reap()
+
+    def _reap(self):
+        # drop the late answers of the solvers that lost a race, and restart
+        # those still busy with it after the grace period
+        now = time.time()
+        for name, since in list(self.lost.items()):
+            conn = self.backends[name][1]
+            try:
+                while self.outstanding[name] > 0 and conn.poll():
+                    conn.recv()
+                    self.outstanding[name] -= 1
+            except EOFError:
+                logging.warning("Solver %s died, restarting it", name)
+                self._start(name)
+                continue
+            if self.outstanding[name] == 0:
+                del self.lost[name]
+            elif now - since >= RESTART_GRACE:
+                self._restart(name)
+
+    def _restart(self, name):
+        process, conn = self.backends[name]
+        logging.debug("PORTFOLIO: cancelling %s", name)
+        conn.close()
+        process.terminate()
+        process.join()
+        self._start(name)
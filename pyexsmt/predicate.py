@@ -3,6 +3,8 @@
 class Predicate:
     """Predicate is one specific ``if'' encountered during the program execution.
        """
+    __slots__ = ("symtype", "result")
+
     def __init__(self, st, result):
         self.symtype = st
         self.result = result
@@ -15,7 +17,8 @@ class Predicate:
             return False
 
     def __hash__(self):
-        return hash(self.symtype)
+        # never ask the solver for the concrete value of symtype
+        return hash((self.symtype.expr, self.result))
 
     def __str__(self):
         return "%s (%s)" % (repr(self.symtype), self.result)
@@ -1,101 +1,176 @@
 import logging
-from graphviz import Source
+import time
 
 from pyexsmt import pred_to_smt, get_concr_value, match_smt_type
+from pyexsmt import graph
 from pyexsmt.symbolic_types import SymbolicObject
 from pyexsmt.symbolic_types.symbolic_object import to_pysmt, is_instance_userdefined_and_newclass
 
 from pysmt.shortcuts import *
 
+class Execution(object):
+    """One explored path: the inputs that drove it, what it returned and
+       the constraint it ended on."""
+    def __init__(self, number, inputs, ret, value, constraint, elapsed):
+        '''
+        inputs : [(name, value)]
+        ret : the (possibly symbolic) return value, value its concrete value
+        elapsed : seconds since the previous execution was recorded
+        '''
+        self.number = number
+        self.inputs = inputs
+        self.ret = ret
+        self.value = value
+        self.constraint = constraint
+        self.elapsed = elapsed
+
+    def path_condition(self):
+        return self.constraint.get_formula()
+
+    def __str__(self):
+        return "%d: %s -> %s" % (self.number, self.inputs, self.value)
+
 class Result(object):
     def __init__(self, path):
         self.path = path
+        # the inputs and return value of every execution, unless keep is
+        # False; the executions can be streamed to a sink instead
         self.generated_inputs = []
         self.execution_return_values = []
-        self.list_rep = None
-        self.curr_id = 0
+        self.keep = True
+        self.sink = None
+        self.num_executions = 0
+        # inputs of the execution under way, then its Execution
+        self.current_inputs = None
+        self.last = None
+        self.last_time = time.time()
+        # how the exploration ended
+        self.timed_out = False
+        self.pending = 0
+        self.abandoned = 0
 
     def record_inputs(self, inputs):
-        inputs = [(k, get_concr_value(inputs[k])) for k in inputs]
-        self.generated_inputs.append(inputs)
+        self.record_input_values([(k, get_concr_value(inputs[k])) for k in inputs])
+
+    def record_input_values(self, inputs):
+        '''
+        inputs : [(name, concrete value)]
+        '''
+        self.current_inputs = inputs
+        if self.keep:
+            self.generated_inputs.append(inputs)
         logging.debug("RECORDING INPUTS: %s", inputs)
 
     def record_output(self, ret):
+        self.record_effect(ret, get_concr_value(ret))
+
+    def record_effect(self, ret, value):
+        '''
+        ret : the (possibly symbolic) return value of the execution
+        value : its concrete value under the inputs that produced it
+        '''
         logging.info("RECORDING EFFECT: %s -> %s", self.path.current_constraint, ret)
         self.path.current_constraint.effect = ret
-        if isinstance(ret, SymbolicObject):
-            ret = ret.get_concr_value()
-        self.execution_return_values.append(ret)
-
-    def to_dot(self, filename):
-        header = "digraph {\n"
-        footer = "}\n"
-        if self.list_rep is None:
-            self.list_rep = self._to_list_rep(self.path.root_constraint)
-        dot = self._to_dot(self.list_rep)
-        dot = header + dot + footer
-        s = Source(dot, filename=filename+".dot", format="png")
-        s.view()
-
-    def _to_dot(self, list_rep):
-        curr = self.curr_id
-        if isinstance(list_rep, list) and len(list_rep) == 3:
-            rep = list_rep[0]
-            dot = "\"%s%d\" [ label=\"%s\" ];\n" % (rep, curr, rep)
-            self.curr_id += 1
-
-            for slot in range(1, 3):
-                child = list_rep[slot]
-                if child is None:
-                    continue
-                crep = child[0] if isinstance(child, list) else to_pysmt(child)
-                crep = str(crep).replace('"', '\\\"')
-                dot += "\"%s%d\" -> \"%s%d\" [ label=\"%d\" ];\n" \
-                        %(rep, curr, crep, self.curr_id, slot%2)
-                dot += self._to_dot(child)
-            return dot
-        elif list_rep is not None:
-            list_rep = to_pysmt(list_rep)
-            list_rep = str(list_rep).replace('"', '\\\"')
-            temp = "\"%s%d\" [ label=\"%s\" ];\n" % (list_rep, curr, list_rep)
-            self.curr_id += 1
-            return temp
-        else:
-            return ""
-
-    def to_summary(self, unknown=Symbol('Unknown', INT)):
-        if self.list_rep is None:
-            self.list_rep = self._to_list_rep(self.path.root_constraint)
-        summary = self._to_summary(self.list_rep, unknown)
-        return summary
-
-    def _to_summary(self, list_rep, unknown):
-        if isinstance(list_rep, list) and len(list_rep) == 3:
-            return Ite(list_rep[0], self._to_summary(list_rep[1], unknown),\
-                        self._to_summary(list_rep[2], unknown))
-        elif list_rep is not None:
-            if isinstance(list_rep, SymbolicObject) or not is_instance_userdefined_and_newclass(list_rep):
-                return match_smt_type(to_pysmt(list_rep), unknown.get_type())
-            else:
-                print(list_rep, type(list_rep))
-                raise TypeError("Summaries don't support object returns")
-        else:
-            return unknown
+        if self.keep:
+            self.execution_return_values.append(value)
+        now = time.time()
+        self.last = Execution(self.num_executions, self.current_inputs, ret, value, \
+                              self.path.current_constraint, now - self.last_time)
+        self.last_time = now
+        self.num_executions += 1
+        if self.sink is not None:
+            self.sink.write(self.last)
 
-    def _to_list_rep(self, node):
-        if node is None:
-            return None
-        children = node.children
-        if len(children) == 2:
-            if node.children[0].predicate.symtype.symbolic_eq(node.children[1].predicate.symtype):
-                left = node.children[0] if node.children[0].predicate.result else node.children[1]
-                right = node.children[1] if not node.children[1].predicate.result else node.children[0]
-                return [pred_to_smt(left.predicate), self._to_list_rep(left), self._to_list_rep(right)]
-            else:
+    def coverage_summary(self):
+        s = "%d paths, %d branches covered, %d constraints pending, %d queries abandoned" \
+            % (self.num_executions, self.path.num_constraints, self.pending, self.abandoned)
+        if self.timed_out:
+            s += " (time budget exhausted)"
+        return s
+
+    def to_dot(self, filename, render=False, **limits):
+        '''
+        Write the tree to filename.dot, and render it to a PNG if render
+        limits : max_depth, max_nodes and collapse, see graph.nodes
+        '''
+        with open(filename + ".dot", "w") as out:
+            graph.write_dot(out, self.path.root_constraint, **limits)
+        if render:
+            graph.render(filename + ".dot")
+
+    def to_json_tree(self, filename, **limits):
+        '''
+        Write the tree to filename.json, one JSON record per node
+        '''
+        with open(filename + ".json", "w") as out:
+            graph.write_json(out, self.path.root_constraint, **limits)
+
+    def to_summary(self, unknown=Symbol('Unknown', INT), simplify=False, reduce=False):
+        '''
+        returns a formula equal to the return value on the paths explored,
+        and to unknown elsewhere. pySMT shares equal subformulas, so the
+        summary is a DAG; a branch whose two sides are equal is dropped.
+        simplify : run pySMT's simplifier over the conditions and the result
+        reduce : also drop the branches shown infeasible and the tests of a
+        condition already decided by the test just above (BDD-style)
+        '''
+        # post-order walk with an explicit stack; values holds the summaries
+        # of the subtrees done, the then side before the else side
+        stack = [(self.path.root_constraint, False)]
+        values = []
+        while len(stack) > 0:
+            node, done = stack.pop()
+            children = node.children
+            if len(children) == 0:
+                values.append(self._leaf_summary(node.effect, unknown))
+                continue
+            if len(children) > 2:
+                raise ValueError("Should not be possible! Can't have more than two children.")
+            if len(children) == 2 and not \
+                    children[0].predicate.symtype.symbolic_eq(children[1].predicate.symtype):
                 raise ValueError("Two children of a constraint should have the same predicate!")
-        elif len(node.children) == 1:
-            return [pred_to_smt(node.children[0].predicate), self._to_list_rep(node.children[0]), None]
-        elif len(children) == 0:
-            return node.effect
+            if not done:
+                stack.append((node, True))
+                for child in sorted(children, key=lambda c: c.predicate.result):
+                    stack.append((child, False))
+                continue
+            if len(children) == 2:
+                other = values.pop()
+                child = children[0] if children[0].predicate.result else children[1]
+                cond = child.predicate.symtype.expr
+            else:
+                child = children[0]
+                cond = pred_to_smt(child.predicate)
+                # None: the other side is never taken, its value doesn't matter
+                other = None if reduce and child.infeasible is not None else unknown
+            values.append(self._ite_summary(cond, values.pop(), other, simplify, reduce))
+        summary = values.pop()
+        return summary.simplify() if simplify else summary
+
+    def _leaf_summary(self, effect, unknown):
+        if effect is None:
+            return unknown
+        if isinstance(effect, SymbolicObject) or not is_instance_userdefined_and_newclass(effect):
+            return match_smt_type(to_pysmt(effect), unknown.get_type())
+        raise TypeError("Summaries don't support object returns: %s" % type(effect))
 
-        raise ValueError("Should not be possible! Can't have more than two children.")
+    def _ite_summary(self, cond, a, b, simplify, reduce):
+        if b is None:
+            return a
+        if simplify:
+            cond = cond.simplify()
+            if cond.is_true():
+                return a
+            if cond.is_false():
+                return b
+        if reduce:
+            if cond.is_not():
+                cond, a, b = cond.arg(0), b, a
+            # Ite(c, Ite(c, x, y), z) = Ite(c, x, z)
+            if a.is_ite() and a.arg(0) is cond:
+                a = a.arg(1)
+            if b.is_ite() and b.arg(0) is cond:
+                b = b.arg(2)
+        if a is b:
+            return a
+        return Ite(cond, a, b)
@@ -0,0 +1,44 @@
+# Copyright: see copyright.txt
+
+import logging
+
+from pyexsmt import pred_to_smt
+
+def independent_slice(asserts, query):
+    '''
+    asserts : [Predicate], the path prefix
+    query : Predicate, the branch about to be negated
+    returns the asserts that transitively share a free symbol with the query,
+    in their original order. The others can't influence its satisfiability.
+    '''
+    parent = {}
+
+    def find(s):
+        root = s
+        while parent[root] is not root:
+            root = parent[root]
+        while parent[s] is not root:
+            parent[s], s = root, parent[s]
+        return root
+
+    def union(symbols):
+        roots = []
+        for s in symbols:
+            parent.setdefault(s, s)
+            roots.append(find(s))
+        for r in roots[1:]:
+            parent[find(r)] = find(roots[0])
+
+    assert_symbols = [pred_to_smt(p).get_free_variables() for p in asserts]
+    for symbols in assert_symbols:
+        union(symbols)
+    query_symbols = pred_to_smt(query).get_free_variables()
+    union(query_symbols)
+
+    if len(query_symbols) == 0:
+        return []
+    root = find(next(iter(query_symbols)))
+    sliced = [p for p, symbols in zip(asserts, assert_symbols) \
+              if len(symbols) > 0 and find(next(iter(symbols))) is root]
+    logging.debug("SLICED %d of %d asserts", len(sliced), len(asserts))
+    return sliced
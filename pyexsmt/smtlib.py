@@ -0,0 +1,32 @@
+# Copyright: see copyright.txt
+
+from io import StringIO
+
+from pysmt.smtlib.parser import SmtLibParser
+from pysmt.smtlib.printers import to_smtlib
+
+def dumps(exprs):
+    '''
+    exprs : [pySMT Object (FNode)]
+    returns an SMT-LIB script that declares every free symbol of exprs
+    and binds each expression, in order, to a nullary define-fun
+    '''
+    symbols = set()
+    for e in exprs:
+        symbols.update(e.get_free_variables())
+
+    lines = []
+    for s in sorted(symbols, key=lambda s: s.symbol_name()):
+        lines.append("(declare-fun %s %s)" % (to_smtlib(s), s.symbol_type().as_smtlib(funstyle=True)))
+    for i, e in enumerate(exprs):
+        lines.append("(define-fun e%d () %s %s)" % (i, e.get_type().as_smtlib(funstyle=False), \
+                                                    to_smtlib(e, daggify=True)))
+    return "\n".join(lines)
+
+def loads(text):
+    '''
+    text : String produced by dumps
+    returns the list of pySMT expressions, in the order they were dumped
+    '''
+    script = SmtLibParser().get_script(StringIO(text))
+    return [cmd.args[-1] for cmd in script.commands if cmd.name == "define-fun"]
@@ -0,0 +1,158 @@
+# Copyright: see copyright.txt
+
+from collections import deque
+import heapq
+import itertools
+import random
+
+class SearchStrategy:
+    """Decides in which order the queued constraints get solved."""
+    def add(self, constraint):
+        raise NotImplementedError("%s doesn't implement add" % self.__class__.__name__)
+
+    def pop(self):
+        raise NotImplementedError("%s doesn't implement pop" % self.__class__.__name__)
+
+    def __len__(self):
+        raise NotImplementedError("%s doesn't implement __len__" % self.__class__.__name__)
+
+    def executed(self, constraint):
+        '''
+        constraint : the leaf of the path the last execution followed
+        called by the engine after every execution
+        '''
+        pass
+
+class BFSStrategy(SearchStrategy):
+    """Solves constraints in the order they were discovered."""
+    def __init__(self):
+        self.queue = deque([])
+
+    def add(self, constraint):
+        self.queue.append(constraint)
+
+    def pop(self):
+        return self.queue.popleft()
+
+    def __len__(self):
+        return len(self.queue)
+
+class DFSStrategy(SearchStrategy):
+    """Solves the most recently discovered constraint first. Consecutive
+       queries then share the longest possible prefix."""
+    def __init__(self):
+        self.stack = []
+
+    def add(self, constraint):
+        self.stack.append(constraint)
+
+    def pop(self):
+        return self.stack.pop()
+
+    def __len__(self):
+        return len(self.stack)
+
+class ShortestQueryStrategy(SearchStrategy):
+    """Solves the constraint with the shortest path (cheapest query) first."""
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+
+    def add(self, constraint):
+        heapq.heappush(self.heap, (constraint.get_length(), next(self.counter), constraint))
+
+    def pop(self):
+        return heapq.heappop(self.heap)[-1]
+
+    def __len__(self):
+        return len(self.heap)
+
+class RandomPathStrategy(SearchStrategy):
+    """Walks down from the root picking uniformly among the subtrees that
+       still hold queued constraints, so shallow constraints are favoured
+       without starving deep ones (random-path selection in KLEE)."""
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+        self.root = None
+        # constraint id -> number of queued constraints in its subtree
+        self.pending = {}
+        self.queued = set()
+
+    def add(self, constraint):
+        if self.root is None:
+            root = constraint
+            while root.parent is not None:
+                root = root.parent
+            self.root = root
+        self.queued.add(constraint.id)
+        self._update(constraint, 1)
+
+    def pop(self):
+        node = self.root
+        while True:
+            options = [c for c in node.children if self.pending.get(c.id, 0) > 0]
+            if node.id in self.queued:
+                options.append(node)
+            choice = self.random.choice(options)
+            if choice is node:
+                break
+            node = choice
+        self.queued.remove(node.id)
+        self._update(node, -1)
+        return node
+
+    def __len__(self):
+        return len(self.queued)
+
+    def _update(self, constraint, delta):
+        tmp = constraint
+        while tmp is not None:
+            count = self.pending.get(tmp.id, 0) + delta
+            if count == 0:
+                del self.pending[tmp.id]
+            else:
+                self.pending[tmp.id] = count
+            tmp = tmp.parent
+
+class UncoveredFirstStrategy(SearchStrategy):
+    """Solves first the constraints whose negation leads to the branch
+       outcome covered the fewest times by previous executions."""
+    def __init__(self):
+        self.heap = []
+        self.counter = itertools.count()
+        # (branch condition, outcome) -> number of executions that took it
+        self.coverage = {}
+
+    def add(self, constraint):
+        heapq.heappush(self.heap, (self._priority(constraint), next(self.counter), constraint))
+
+    def pop(self):
+        # priorities only grow as coverage grows, so re-queue stale entries lazily
+        while True:
+            priority, _, constraint = heapq.heappop(self.heap)
+            current = self._priority(constraint)
+            if current <= priority or len(self.heap) == 0 or current <= self.heap[0][0]:
+                return constraint
+            heapq.heappush(self.heap, (current, next(self.counter), constraint))
+
+    def __len__(self):
+        return len(self.heap)
+
+    def executed(self, constraint):
+        tmp = constraint
+        while tmp.predicate is not None:
+            key = (tmp.predicate.symtype.expr, tmp.predicate.result)
+            self.coverage[key] = self.coverage.get(key, 0) + 1
+            tmp = tmp.parent
+
+    def _priority(self, constraint):
+        # the query negates the predicate, so look at the opposite outcome
+        return self.coverage.get((constraint.predicate.symtype.expr, not constraint.predicate.result), 0)
+
+STRATEGIES = {
+    "bfs": BFSStrategy,
+    "dfs": DFSStrategy,
+    "random": RandomPathStrategy,
+    "shortest": ShortestQueryStrategy,
+    "uncovered": UncoveredFirstStrategy,
+}
@@ -0,0 +1,221 @@
+# Copyright: see copyright.txt
+
+import inspect
+import itertools
+import logging
+
+from pyexsmt import get_concr_value, pred_to_smt
+from pyexsmt.explore import ExplorationEngine
+from pyexsmt.instrument import to_term
+from pyexsmt.invocation import FunctionInvocation
+from pyexsmt.symbolic_types.symbolic_object import SymbolicObject
+from pyexsmt.symbolic_types.symbolic_int import SymbolicInteger
+from pyexsmt.symbolic_types.symbolic_bitvec import SymbolicBitVec, to_signed
+
+from pysmt.shortcuts import *
+
+# Function summaries: the first time a function decorated with
+# pyexsmt.args.summarize is called with symbolic arguments, it is explored
+# on its own, with fresh symbols for its parameters. What it returns on
+# each path is folded into a single term, Ite(path condition, result, ...),
+# that later calls instantiate with their arguments instead of branching
+# inside the function: the paths of the caller and of the callee add up
+# instead of multiplying.
+#
+# The exploration of the callee may stop before covering every path, and a
+# path may raise or return something that isn't an int or a bool. A call
+# then branches once on whether its arguments lead to a path the summary
+# covers, and runs the function as usual if they don't.
+
+# solver used to explore the callees
+SOLVER = "z3"
+# executions spent on exploring one callee
+MAX_ITERATIONS = 100
+# branches followed on a path of the callee; the paths cut short are left
+# out of the summary
+MAX_DEPTH = 32
+
+class SummaryStats:
+    """Counts the summaries built and the calls answered by them."""
+    def __init__(self):
+        self.built = 0
+        self.unusable = 0
+        self.calls = 0
+        self.fallbacks = 0
+
+    def __str__(self):
+        return "%d built, %d unusable, %d calls summarized, %d run the callee" \
+               % (self.built, self.unusable, self.calls, self.fallbacks)
+
+stats = SummaryStats()
+
+# (module, function name, argument types) -> Summary, None if it can't be
+# summarized; the target is reloaded for every execution, so functions are
+# known by name
+cache = {}
+# functions being explored right now; calling them again runs them as is
+_active = set()
+_ids = itertools.count()
+
+class Summary:
+    """The outcome of exploring a function: its result, in terms of the
+       symbols standing for its parameters, and the condition under which
+       the result is known."""
+    def __init__(self, params, value, covered):
+        '''
+        params : [FNode] the symbols of the parameters
+        value : FNode, the result where covered holds
+        covered : FNode, TRUE if every path was explored
+        '''
+        self.params = params
+        self.value = value
+        self.covered = covered
+
+    def apply(self, f, args):
+        mapping = dict(zip(self.params, [to_term(a) for a in args]))
+        values = dict((p, _constant(get_concr_value(a), p.symbol_type())) for p, a in zip(self.params, args))
+
+        if not self.covered.is_true():
+            covered = SymbolicObject(self.covered.substitute(mapping), concr=_evaluate(self.covered, values))
+            if not covered:
+                stats.fallbacks += 1
+                return f(*args)
+
+        stats.calls += 1
+        value = self.value.substitute(mapping)
+        concr = _evaluate(self.value, values)
+        t = value.get_type()
+        if t.is_int_type():
+            return SymbolicInteger(value, concr=concr)
+        if t.is_bv_type():
+            return SymbolicBitVec(value, concr=None if concr is None else to_signed(concr, t.width))
+        return SymbolicObject(value, concr=concr)
+
+def call(f, args):
+    '''
+    Called by the functions decorated with summarize
+    returns what f(*args) returns, from the summary of f if there is one
+    '''
+    name = (f.__module__, f.__qualname__)
+    if SymbolicObject.SI is None or name in _active or not any(isinstance(a, SymbolicObject) for a in args):
+        return f(*args)
+    types = tuple(_type(a) for a in args)
+    if None in types:
+        return f(*args)
+    key = name + (types,)
+    if key not in cache:
+        cache[key] = _summarize(f, types)
+    summary = cache[key]
+    if summary is None:
+        return f(*args)
+    return summary.apply(f, args)
+
+def _summarize(f, types):
+    parameters = list(inspect.signature(f).parameters.values())
+    if len(parameters) != len(types) or \
+       any(p.kind not in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD) for p in parameters):
+        return None
+    names = [p.name for p in parameters]
+    logging.info("SUMMARIZING %s%s", f.__name__, types)
+
+    invocation = FunctionInvocation(lambda **args: f(*[args[n] for n in names]), lambda: None)
+    symbols = []
+    summary_id = next(_ids)
+    for n, t in zip(names, types):
+        symbol = Symbol("%s.%s.%d" % (f.__name__, n, summary_id), t)
+        symbols.append(symbol)
+        invocation.add_arg_constructor(n, _constructor(symbol))
+
+    # the engine takes over the hooks of the execution being interrupted
+    saved = (SymbolicObject.SI, SymbolicObject.SOLVER)
+    _active.add((f.__module__, f.__qualname__))
+    try:
+        engine = ExplorationEngine(invocation, solver=SOLVER)
+        engine.explore(MAX_ITERATIONS, MAX_DEPTH)
+    finally:
+        _active.discard((f.__module__, f.__qualname__))
+        SymbolicObject.SI, SymbolicObject.SOLVER = saved
+
+    # the int results of a function of bit-vectors are bit-vectors too
+    sort = next((t for t in types if t.is_bv_type()), None)
+    value, covered = _fold(engine.path.root_constraint, sort)
+    if value is None:
+        logging.info("No summary for %s%s", f.__name__, types)
+        stats.unusable += 1
+        return None
+    stats.built += 1
+    summary = Summary(symbols, value, covered.simplify())
+    logging.debug("SUMMARY %s%s: %s if %s", f.__name__, types, summary.value, summary.covered)
+    return summary
+
+def _fold(node, sort=None):
+    '''
+    returns (value, covered) for the subtree of node: value is the result
+    of the paths through it where covered holds, None if there are none
+    sort : pySMT type to build the int results in, see to_term
+    '''
+    children = node.children
+    if len(children) == 0:
+        if node.depth >= MAX_DEPTH:
+            # the path may have gone on branching
+            return None, FALSE()
+        value = to_term(node.effect, sort)
+        if value is None:
+            # raised, or returned something a term can't stand for
+            return None, FALSE()
+        return value, TRUE()
+    if len(children) == 1:
+        child = children[0]
+        value, covered = _fold(child, sort)
+        condition = pred_to_smt(child.predicate)
+        if child.infeasible is None:
+            # the other branch wasn't explored
+            return value, And(condition, covered)
+        return value, Implies(condition, covered)
+    true, false = children if children[0].predicate.result else reversed(children)
+    condition = pred_to_smt(true.predicate)
+    a, ca = _fold(true, sort)
+    b, cb = _fold(false, sort)
+    if a is not None and b is not None and a.get_type() != b.get_type():
+        return None, FALSE()
+    if a is None:
+        return b, And(Not(condition), cb)
+    if b is None:
+        return a, And(condition, ca)
+    return Ite(condition, a, b), Ite(condition, ca, cb)
+
+def _type(value):
+    if isinstance(value, SymbolicObject):
+        t = value.expr.get_type()
+        return t if t.is_bool_type() or t.is_int_type() or t.is_bv_type() else None
+    if isinstance(value, bool):
+        return BOOL
+    if isinstance(value, int):
+        return INT
+    return None
+
+def _constructor(symbol):
+    t = symbol.symbol_type()
+    if t.is_int_type():
+        return lambda n: SymbolicInteger(symbol)
+    if t.is_bv_type():
+        return lambda n: SymbolicBitVec(symbol)
+    return lambda n: SymbolicObject(symbol)
+
+def _constant(value, t):
+    if value is None:
+        return None
+    if t.is_bv_type():
+        return BV(value % (1 << t.width), t.width)
+    if t.is_bool_type():
+        return Bool(value)
+    return Int(value)
+
+def _evaluate(expr, values):
+    # the value of expr at the concrete arguments, None if one is unknown
+    if any(v is None for v in values.values()):
+        return None
+    result = expr.substitute(values).simplify()
+    if not result.is_constant():
+        return None
+    return result.constant_value()
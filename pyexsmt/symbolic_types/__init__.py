@@ -2,8 +2,12 @@
 
 from pyexsmt.symbolic_types.symbolic_int import SymbolicInteger
 from pyexsmt.symbolic_types.symbolic_int import SymbolicObject
+from pyexsmt.symbolic_types.symbolic_bitvec import SymbolicBitVec
+from pyexsmt.args import BitVec
 
 def get_symbolic(v):
+    if isinstance(v, BitVec):
+        return lambda expr, name: SymbolicBitVec(expr, name, v.width)
     exported = [(int, SymbolicInteger), (bool, SymbolicObject)]
     for (t, s) in exported:
         if isinstance(v, t):
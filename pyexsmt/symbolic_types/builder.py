@@ -0,0 +1,141 @@
+# Copyright: see copyright.txt
+
+from pysmt.shortcuts import *
+
+# Integer terms are kept as normalized linear sums c1*t1 + ... + cn*tn + c,
+# where the ti are non-linear atoms (symbols, products of symbols, function
+# applications) ordered by node id. Since pySMT hash-conses formulas, two
+# sums that are equal up to reordering end up as the same node.
+
+class TermStats:
+    """Counts the integer terms built by the symbolic operators."""
+    def __init__(self):
+        self.built = 0
+        self.folded = 0
+        self.merged = 0
+        self.max_width = 0
+        self.total_width = 0
+
+    def record(self, width, merged):
+        '''
+        width : number of monomials left in the term, 0 if it was folded
+        merged : number of monomials of the operands that merged or
+        cancelled out
+        '''
+        self.built += 1
+        if width == 0:
+            self.folded += 1
+        self.merged += merged
+        self.total_width += width
+        self.max_width = max(self.max_width, width)
+
+    def __str__(self):
+        mean = self.total_width / self.built if self.built > 0 else 0
+        return "%d built, %d folded to constants, %d monomials merged, width max %d mean %.1f" \
+               % (self.built, self.folded, self.merged, self.max_width, mean)
+
+stats = TermStats()
+
+def linear(expr):
+    '''
+    expr : pySMT INT expression
+    returns (coeffs, const) with coeffs : {atom : int} such that
+    expr = sum(c * atom) + const
+    '''
+    if expr.is_int_constant():
+        return {}, expr.constant_value()
+    if expr.is_minus():
+        # not built here, e.g. loaded from a checkpoint
+        ca, ka = linear(expr.arg(0))
+        cb, kb = linear(expr.arg(1))
+        for atom, c in cb.items():
+            ca[atom] = ca.get(atom, 0) - c
+        return ca, ka - kb
+    coeffs = {}
+    const = 0
+    for m in expr.args() if expr.is_plus() else [expr]:
+        c, atom = _monomial(m)
+        if atom is None:
+            const += c
+        else:
+            coeffs[atom] = coeffs.get(atom, 0) + c
+    return coeffs, const
+
+def build(coeffs, const):
+    '''
+    returns the normalized pySMT expression for sum(c * atom) + const
+    '''
+    monomials = []
+    for atom in sorted(coeffs, key=lambda a: a.node_id()):
+        c = coeffs[atom]
+        if c == 1:
+            monomials.append(atom)
+        elif c != 0:
+            monomials.append(Times(Int(c), atom))
+    if const != 0 or len(monomials) == 0:
+        monomials.append(Int(const))
+    if len(monomials) == 1:
+        return monomials[0]
+    return Plus(monomials)
+
+def add(a, b, sign=1):
+    '''
+    returns a + sign * b
+    '''
+    ca, ka = linear(a)
+    cb, kb = linear(b)
+    coeffs = dict(ca)
+    for atom, c in cb.items():
+        coeffs[atom] = coeffs.get(atom, 0) + sign * c
+    return _record(build(coeffs, ka + sign * kb), coeffs, len(ca) + len(cb))
+
+def mul(a, b):
+    if not a.is_int_constant() and b.is_int_constant():
+        a, b = b, a
+    if a.is_int_constant():
+        k = a.constant_value()
+        cb, kb = linear(b)
+        coeffs = dict((atom, k * c) for atom, c in cb.items())
+        return _record(build(coeffs, k * kb), coeffs, len(cb))
+    # a non-linear product is an atom of its own
+    stats.record(1, 0)
+    return Times(a, b)
+
+def neg(a):
+    return mul(Int(-1), a)
+
+def compare(op, a, b):
+    '''
+    op : pySMT constructor of a comparison (Equals, LT, LE, ...)
+    returns op(a, b) with the constants moved to the right-hand side, or
+    a python bool if the comparison doesn't depend on any symbol
+    '''
+    ca, ka = linear(a)
+    cb, kb = linear(b)
+    if ca == cb:
+        # the symbolic parts cancel out
+        stats.record(0, 2 * len(ca))
+        return op(Int(0), Int(kb - ka)).simplify().constant_value()
+    return op(build(ca, 0), build(cb, kb - ka))
+
+def _record(expr, coeffs, operands):
+    width = sum(1 for c in coeffs.values() if c != 0)
+    stats.record(width, operands - width)
+    return expr
+
+def _monomial(m):
+    # returns (coefficient, atom), atom is None for a constant
+    if m.is_int_constant():
+        return m.constant_value(), None
+    if m.is_times():
+        c = 1
+        rest = []
+        for f in m.args():
+            if f.is_int_constant():
+                c *= f.constant_value()
+            else:
+                rest.append(f)
+        if len(rest) == 0:
+            return c, None
+        return c, rest[0] if len(rest) == 1 else Times(rest)
+    return 1, m
@@ -0,0 +1,190 @@
+# Copyright: see copyright.txt
+
+import operator
+
+from pyexsmt.symbolic_types.symbolic_object import SymbolicObject, concr_op
+
+from pysmt.shortcuts import *
+
+# Python ints are signed, so a bit-vector stands for a two's complement
+# integer: comparisons, >>, // and % use the signed operators, and every
+# concrete value is wrapped to the width the same way the solver does.
+
+def to_signed(value, width):
+    value &= (1 << width) - 1
+    if value >= 1 << (width - 1):
+        value -= 1 << width
+    return value
+
+def shift_left(a, b, width):
+    # the count is read unsigned, so a negative one is at least the width
+    return 0 if b < 0 or b >= width else a << b
+
+def shift_right(a, b, width):
+    return a >> (width - 1 if b < 0 or b >= width else b)
+
+def _rounds_wrong(a, b, width):
+    # bvsdiv rounds towards zero and bvsrem takes the sign of the dividend,
+    # python rounds down and % takes the sign of the divisor: they differ
+    # when the remainder isn't 0 and doesn't have the sign of the divisor
+    r = BVSRem(a, b)
+    zero = BV(0, width)
+    return And(NotEquals(r, zero), Not(Iff(BVSLT(r, zero), BVSLT(b, zero))))
+
+def py_mod(a, b, width):
+    r = BVSRem(a, b)
+    return Ite(_rounds_wrong(a, b, width), BVAdd(r, b), r)
+
+def py_floordiv(a, b, width):
+    # not (a - a % b) / b, which overflows for a close to the minimum
+    q = BVSDiv(a, b)
+    return Ite(_rounds_wrong(a, b, width), BVSub(q, BV(1, width)), q)
+
+class SymbolicBitVec(SymbolicObject):
+    """An integer input encoded as a fixed-width bit-vector, selected with
+       @symbolic(x=BitVec(64)) or --int-encoding bv64. Arithmetic wraps
+       around at the width, like the machine integers it models."""
+    def __init__(self, expr, name = "se", width=64, concr=None):
+        if expr is not None:
+            width = expr.bv_width()
+        SymbolicObject.__init__(self, expr, name, BVType(width), concr)
+        self.width = width
+
+    def get_concr_value(self):
+        if self.concr is not None:
+            return self.concr
+        # the model holds the unsigned reading of the bits
+        return to_signed(SymbolicObject.get_concr_value(self), self.width)
+
+    ## COMPARISON OPERATORS
+    def __eq__(self, other):
+        return self._compare(Equals, operator.eq, other)
+
+    def __ne__(self, other):
+        return self._compare(NotEquals, operator.ne, other)
+
+    def __lt__(self, other):
+        return self._compare(BVSLT, operator.lt, other)
+
+    def __le__(self, other):
+        return self._compare(BVSLE, operator.le, other)
+
+    def __gt__(self, other):
+        return self._compare(BVSGT, operator.gt, other)
+
+    def __ge__(self, other):
+        return self._compare(BVSGE, operator.ge, other)
+
+    __hash__ = SymbolicObject.__hash__
+
+    ## ARITHMETIC OPERATORS
+    def __add__(self, other):
+        return self._apply(BVAdd, operator.add, other)
+
+    def __sub__(self, other):
+        return self._apply(BVSub, operator.sub, other)
+
+    def __mul__(self, other):
+        return self._apply(BVMul, operator.mul, other)
+
+    def __floordiv__(self, other):
+        return self._apply(lambda a, b: py_floordiv(a, b, self.width), operator.floordiv, other)
+
+    def __mod__(self, other):
+        return self._apply(lambda a, b: py_mod(a, b, self.width), operator.mod, other)
+
+    ## LOGICAL OPERATORS
+    def __and__(self, other):
+        return self._apply(BVAnd, operator.and_, other)
+
+    def __or__(self, other):
+        return self._apply(BVOr, operator.or_, other)
+
+    def __xor__(self, other):
+        return self._apply(BVXor, operator.xor, other)
+
+    def __lshift__(self, other):
+        return self._apply(BVLShl, self._shift_left, other)
+
+    def __rshift__(self, other):
+        return self._apply(BVAShr, self._shift_right, other)
+
+    ## UNARY OPERATORS
+    def __neg__(self):
+        return self._wrap(BVNeg(self.expr), concr_op(operator.neg, self))
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        expr = Ite(BVSLT(self.expr, BV(0, self.width)), BVNeg(self.expr), self.expr)
+        return self._wrap(expr, concr_op(abs, self))
+
+    def __invert__(self):
+        return self._wrap(BVNot(self.expr), concr_op(operator.invert, self))
+
+    ## REVERSE OPERATORS
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __rand__(self, other):
+        return self.__and__(other)
+
+    def __ror__(self, other):
+        return self.__or__(other)
+
+    def __rxor__(self, other):
+        return self.__xor__(other)
+
+    def __rsub__(self, other):
+        return self._apply(BVSub, operator.sub, other, reverse=True)
+
+    def __rfloordiv__(self, other):
+        return self._apply(lambda a, b: py_floordiv(a, b, self.width), operator.floordiv, other, reverse=True)
+
+    def __rmod__(self, other):
+        return self._apply(lambda a, b: py_mod(a, b, self.width), operator.mod, other, reverse=True)
+
+    def __rlshift__(self, other):
+        return self._apply(BVLShl, self._shift_left, other, reverse=True)
+
+    def __rrshift__(self, other):
+        return self._apply(BVAShr, self._shift_right, other, reverse=True)
+
+    # private
+
+    def _shift_left(self, a, b):
+        return shift_left(a, b, self.width)
+
+    def _shift_right(self, a, b):
+        return shift_right(a, b, self.width)
+
+    def _operand(self, other):
+        if isinstance(other, SymbolicBitVec):
+            if other.width != self.width:
+                raise TypeError("CANNOT MIX %d and %d bit integers" % (self.width, other.width))
+            return other.expr
+        if isinstance(other, int) and not isinstance(other, bool):
+            return BV(other % (1 << self.width), self.width)
+        raise TypeError("CANNOT COMBINE %s with a %d bit integer" % (type(other), self.width))
+
+    def _apply(self, op, pyop, other, reverse=False):
+        b = self._operand(other)
+        value = other if isinstance(other, SymbolicBitVec) else to_signed(other, self.width)
+        concr = concr_op(pyop, value, self) if reverse else concr_op(pyop, self, value)
+        return self._wrap(op(b, self.expr) if reverse else op(self.expr, b), concr)
+
+    def _compare(self, op, pyop, other):
+        if isinstance(other, bool) or not isinstance(other, (int, SymbolicBitVec)):
+            return False
+        b = self._operand(other)
+        value = other if isinstance(other, SymbolicBitVec) else to_signed(other, self.width)
+        return SymbolicObject(op(self.expr, b), concr=concr_op(pyop, self, value))
+
+    def _wrap(self, expr, concr):
+        if concr is not None:
+            concr = to_signed(concr, self.width)
+        return SymbolicBitVec(expr, concr=concr)
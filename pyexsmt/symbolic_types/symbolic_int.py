@@ -1,12 +1,60 @@
 # Copyright: copyright.txt
 
-from pyexsmt.symbolic_types.symbolic_object import SymbolicObject, to_pysmt
+import operator
+
+from pyexsmt.symbolic_types.symbolic_object import SymbolicObject, to_pysmt, concr_op
+from pyexsmt.symbolic_types import builder
 
 from pysmt.shortcuts import *
 
+def smt_div(a, b):
+    # SMT-LIB integer division is euclidean: the remainder is never negative
+    q = a // b
+    if b < 0 and a % b != 0:
+        q += 1
+    return q
+
+def smt_mod(a, b):
+    return a - b * smt_div(a, b)
+
+def wrap(expr, concr):
+    '''
+    returns expr as a SymbolicObject, or as a python value if it was
+    folded to a constant
+    '''
+    if isinstance(expr, bool):
+        return expr
+    if expr.is_constant():
+        return expr.constant_value()
+    if expr.get_type() == INT:
+        return SymbolicInteger(expr, concr=concr)
+    return SymbolicObject(expr, concr=concr)
+
 class SymbolicInteger(SymbolicObject):
-    def __init__(self, expr, name = "se"):
-        SymbolicObject.__init__(self, expr, name, INT)
+    def __init__(self, expr, name = "se", concr=None):
+        SymbolicObject.__init__(self, expr, name, INT, concr)
+
+    ## COMPARISON OPERATORS
+    def __eq__(self, other):
+        return self._compare(Equals, operator.eq, other)
+
+    def __ne__(self, other):
+        return self._compare(NotEquals, operator.ne, other)
+
+    def __lt__(self, other):
+        return self._compare(LT, operator.lt, other)
+
+    def __le__(self, other):
+        return self._compare(LE, operator.le, other)
+
+    def __gt__(self, other):
+        return self._compare(GT, operator.gt, other)
+
+    def __ge__(self, other):
+        return self._compare(GE, operator.ge, other)
+
+    # defining __eq__ would otherwise drop it
+    __hash__ = SymbolicObject.__hash__
 
     ## LOGICAL OPERATORS
     def __and__(self, other):
@@ -17,45 +65,50 @@ class SymbolicInteger(SymbolicObject):
 
     ## ARITHMETIC OPERATORS
     def __add__(self, other):
+        concr = concr_op(operator.add, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             raise TypeError("CANNOT '+' %s and %s" %(self.expr.get_type(), other.get_type()))
-        return SymbolicInteger(self.expr + other)
+        return wrap(builder.add(self.expr, other), concr)
 
     def __sub__(self, other):
+        concr = concr_op(operator.sub, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             raise TypeError("CANNOT '-' %s and %s" %(self.expr.get_type(), other.get_type()))
-        return SymbolicInteger(self.expr - other)
+        return wrap(builder.add(self.expr, other, -1), concr)
 
     def __mul__(self, other):
+        concr = concr_op(operator.mul, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             raise TypeError("CANNOT '*' %s and %s" %(self.expr.get_type(), other.get_type()))
-        return SymbolicInteger(self.expr * other)
+        return wrap(builder.mul(self.expr, other), concr)
 
     def __mod__(self, other):
+        concr = concr_op(smt_mod, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type() or self.expr.get_type() != INT:
             raise TypeError("CANNOT 'mod' %s and %s" %(self.expr.get_type(), other.get_type()))
-        return SymbolicInteger(self.expr % other)
+        return SymbolicInteger(self.expr % other, concr=concr)
 
 
     def __floordiv__(self, other):
+        concr = concr_op(smt_div, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type() or self.expr.get_type() != INT:
             raise TypeError("CANNOT '//' %s and %s" %(self.expr.get_type(), other.get_type()))
-        return SymbolicInteger(self.expr // other)
+        return SymbolicInteger(self.expr // other, concr=concr)
 
     ## UNARY OPERATORS
     def __neg__ (self):
-        return SymbolicInteger(Int(0) - self.expr)
+        return wrap(builder.neg(self.expr), concr_op(operator.neg, self))
 
     def __pos__ (self):
         return self
 
     def __abs__ (self):
-        return SymbolicInteger(Ite(self.expr < 0, -self.expr, self.expr))
+        return SymbolicInteger(Ite(self.expr < 0, -self.expr, self.expr), concr=concr_op(abs, self))
 
     ## REVERSE OPERATORS
     def __radd__ (self, other):
@@ -65,4 +118,13 @@ class SymbolicInteger(SymbolicObject):
         return self.__mul__(other)
 
     def __rsub__(self, other):
-        return (-self).__add__(other)
\ No newline at end of file
+        return (-self).__add__(other)
+
+    # private
+
+    def _compare(self, op, pyop, other):
+        concr = concr_op(pyop, self, other)
+        other = to_pysmt(other)
+        if self.expr.get_type() != other.get_type():
+            return False
+        return wrap(builder.compare(op, self.expr, other), concr)
\ No newline at end of file
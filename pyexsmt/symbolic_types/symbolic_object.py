@@ -2,18 +2,27 @@
 
 import logging
 import inspect
+import operator
 
 from pysmt.shortcuts import *
 
+# terms deeper than this are cut short with "..." when printed: a term
+# built in a loop can share subterms so much that it is exponentially
+# large written out as a tree
+REPR_DEPTH = 8
+
 # the ABSTRACT base class for representing any expression that depends on a symbolic input
 # it also tracks the corresponding concrete value for the expression (aka concolic execution)
 
 class SymbolicObject(object):
-    def __init__(self, expr, name="se", ty=INT):
+    def __init__(self, expr, name="se", ty=INT, concr=None):
         if expr is None:
             self.expr = Symbol(name, ty)
         else:
             self.expr = expr
+        # the value of expr under the current inputs, computed alongside it;
+        # None when it is only known to the solver (e.g. uninterpreted calls)
+        self.concr = concr
 
     # This is set up by the concolic engine to link __bool__ to PathConstraint
     SI = None
@@ -29,7 +38,9 @@ class SymbolicObject(object):
         if t == BOOL:
             obj = self
         elif t == INT:
-            obj = SymbolicObject(NotEquals(self.expr, Int(0)))
+            obj = SymbolicObject(NotEquals(self.expr, Int(0)), concr=concr_op(operator.ne, self, 0))
+        elif t.is_bv_type():
+            obj = SymbolicObject(NotEquals(self.expr, BV(0, t.width)), concr=concr_op(operator.ne, self, 0))
         else:
             raise NotImplementedError("%s not supported in conditional yet" % t)
 
@@ -41,6 +52,8 @@ class SymbolicObject(object):
         return ret
 
     def get_concr_value(self):
+        if self.concr is not None:
+            return self.concr
         if SymbolicObject.SOLVER is None:
             raise ValueError("MUST SPECIFY SOLVER")
         if not SymbolicObject.SOLVER.last_result:
@@ -49,11 +62,8 @@ class SymbolicObject(object):
         return val
 
     def symbolic_eq(self, other):
-        if not isinstance(other, SymbolicObject):
-            ret = False
-        ret = repr(self.expr) == repr(other.expr)
-        logging.debug("Checking equality of %s and %s: result is %s", repr(self), repr(other), ret)
-        return ret
+        # pySMT hash-conses formulas, so equal expressions are the same node
+        return isinstance(other, SymbolicObject) and self.expr is other.expr
 
     def __hash__(self):
         return hash(self.get_concr_value())
@@ -62,59 +72,67 @@ class SymbolicObject(object):
         return str(self.get_concr_value())
 
     def __repr__(self):
-        return self.expr.serialize()
+        return self.expr.serialize(threshold=REPR_DEPTH)
 
 
     ## COMPARISON OPERATORS
     def __eq__(self, other):
         #TODO: what if self is not symbolic and other is?
+        concr = concr_op(operator.eq, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             return False
-        return SymbolicObject(Equals(self.expr, other))
+        return SymbolicObject(Equals(self.expr, other), concr=concr)
 
     def __ne__(self, other):
+        concr = concr_op(operator.ne, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             return False
-        return SymbolicObject(NotEquals(self.expr, other))
+        return SymbolicObject(NotEquals(self.expr, other), concr=concr)
 
     def __lt__(self, other):
+        concr = concr_op(operator.lt, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             return False
-        return SymbolicObject(LT(self.expr, other))
+        return SymbolicObject(LT(self.expr, other), concr=concr)
 
     def __le__(self, other):
+        concr = concr_op(operator.le, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             return False
-        return SymbolicObject(LE(self.expr, other))
+        return SymbolicObject(LE(self.expr, other), concr=concr)
 
     def __gt__(self, other):
+        concr = concr_op(operator.gt, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             return False
-        return SymbolicObject(GT(self.expr, other))
+        return SymbolicObject(GT(self.expr, other), concr=concr)
 
     def __ge__(self, other):
+        concr = concr_op(operator.ge, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             return False
-        return SymbolicObject(GE(self.expr, other))
+        return SymbolicObject(GE(self.expr, other), concr=concr)
 
     ## LOGICAL OPERATORS
     def __and__(self, other):
+        concr = concr_op(operator.and_, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             raise TypeError("CANNOT AND %s and %s" %(self.expr.get_type(), other.get_type()))
-        return SymbolicObject(And(self.expr, other))
+        return SymbolicObject(And(self.expr, other), concr=concr)
 
     def __or__(self, other):
+        concr = concr_op(operator.or_, self, other)
         other = to_pysmt(other)
         if self.expr.get_type() != other.get_type():
             raise TypeError("CANNOT OR %s and %s" %(self.expr.get_type(), other.get_type()))
-        return SymbolicObject(Or(self.expr, other))
+        return SymbolicObject(Or(self.expr, other), concr=concr)
 
     ## UNARY OPERATORS
     def __neg__(self):
@@ -206,6 +224,25 @@ class SymbolicObject(object):
     def __ror__(self, other):
         return self.__or__(other)
 
+def concr_op(op, *operands):
+    '''
+    op : function on python values, mirroring an SMT operator
+    operands : (U SymbolicObject PythonPrimitive)
+    returns op applied to the concrete values of operands, or None if one
+    of them is only known to the solver or op is undefined on them
+    '''
+    values = []
+    for o in operands:
+        v = o.concr if isinstance(o, SymbolicObject) else o
+        if v is None:
+            return None
+        values.append(v)
+    try:
+        return op(*values)
+    except ZeroDivisionError:
+        # left unspecified by SMT-LIB, let the model decide
+        return None
+
 def to_pysmt(val):
     '''
     Take a primitive or a Symbolic object and
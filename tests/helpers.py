@@ -0,0 +1,38 @@
+# Copyright: see copyright.txt
+
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from pyexsmt import parse_int_encoding
+from pyexsmt.explore import ExplorationEngine
+from pyexsmt.loader import loaderFactory
+
+def load(example, entry="", int_encoding="int", passes=()):
+    '''
+    example : name of a file in examples/, without .py, or the path of
+    a Python file
+    returns its Loader
+    '''
+    if example.endswith(".py"):
+        filename = example
+    else:
+        filename = os.path.join(ROOT, "examples", example + ".py")
+    # the loader refuses a module that is already loaded
+    sys.modules.pop(os.path.basename(filename)[:-3], None)
+    return loaderFactory(filename, entry, parse_int_encoding(int_encoding), passes)
+
+def engine(example, int_encoding="int", **options):
+    '''
+    example : as for load, or a Loader
+    returns an ExplorationEngine over example; options are passed on to it
+    '''
+    if isinstance(example, str):
+        example = load(example, int_encoding=int_encoding)
+    return ExplorationEngine(example.create_invocation(), **options)
+
+def returns(result):
+    # the return values of the paths explored, in a comparable order
+    return sorted(result.execution_return_values, key=repr)
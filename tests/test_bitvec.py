@@ -0,0 +1,57 @@
+# Copyright: see copyright.txt
+
+import itertools
+import operator
+
+from helpers import ROOT
+
+from pyexsmt.symbolic_types.symbolic_bitvec import SymbolicBitVec, to_signed
+
+from pysmt.shortcuts import *
+
+WIDTH = 8
+VALUES = [-128, -127, -5, -1, 0, 1, 3, 7, 64, 127]
+
+ARITHMETIC = [operator.add, operator.sub, operator.mul, operator.and_, operator.or_, operator.xor, \
+              operator.floordiv, operator.mod]
+COMPARISONS = [operator.eq, operator.ne, operator.lt, operator.le, operator.gt, operator.ge]
+
+def _inputs(x, y):
+    a = SymbolicBitVec(None, "bv_test_a", WIDTH)
+    b = SymbolicBitVec(None, "bv_test_b", WIDTH)
+    a.concr = x
+    b.concr = y
+    model = {a.expr: BV(x % (1 << WIDTH), WIDTH), b.expr: BV(y % (1 << WIDTH), WIDTH)}
+    return a, b, model
+
+def _solver_value(r, model):
+    value = r.expr.substitute(model).simplify()
+    if value.is_bool_constant():
+        return value.constant_value()
+    return to_signed(value.constant_value(), WIDTH)
+
+def test_arithmetic_wraps_like_python():
+    for pyop, (x, y) in itertools.product(ARITHMETIC, itertools.product(VALUES, VALUES)):
+        if y == 0 and pyop in (operator.floordiv, operator.mod):
+            continue
+        a, b, model = _inputs(x, y)
+        expected = to_signed(pyop(x, y), WIDTH)
+        for r in (pyop(a, b), pyop(a, y), pyop(x, b)):
+            assert r.get_concr_value() == expected, (pyop, x, y)
+            assert _solver_value(r, model) == expected, (pyop, x, y)
+
+def test_shifts_wrap_like_python():
+    for x, y in itertools.product(VALUES, range(WIDTH + 3)):
+        a, b, model = _inputs(x, y)
+        for pyop in (operator.lshift, operator.rshift):
+            expected = to_signed(pyop(x, y), WIDTH)
+            r = pyop(a, b)
+            assert r.get_concr_value() == expected, (pyop, x, y)
+            assert _solver_value(r, model) == expected, (pyop, x, y)
+
+def test_comparisons_are_signed():
+    for pyop, (x, y) in itertools.product(COMPARISONS, itertools.product(VALUES, VALUES)):
+        a, b, model = _inputs(x, y)
+        r = pyop(a, b)
+        assert r.get_concr_value() == pyop(x, y), (pyop, x, y)
+        assert _solver_value(r, model) == pyop(x, y), (pyop, x, y)
@@ -0,0 +1,51 @@
+# Copyright: see copyright.txt
+
+from helpers import engine, returns
+
+from pyexsmt.cache import QueryCache, CounterexampleCache, CachedModel
+
+from pysmt.shortcuts import *
+
+a = Symbol("cache_test_a", INT)
+b = Symbol("cache_test_b", INT)
+
+def test_query_cache_evicts_least_recently_used():
+    cache = QueryCache(2)
+    cache.store([GT(a, Int(0))], True)
+    cache.store([GT(b, Int(0))], True)
+    assert cache.lookup([GT(a, Int(0))]) == (True, None)
+    cache.store([LT(a, Int(0))], False)
+    # GT(b, 0) was the least recently used
+    assert cache.lookup([GT(b, Int(0))]) is None
+    assert cache.lookup([LT(a, Int(0))]) == (False, None)
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 1, 1)
+
+def test_query_cache_ignores_order():
+    cache = QueryCache(2)
+    cache.store([GT(a, Int(0)), GT(b, Int(0))], False)
+    assert cache.lookup([GT(b, Int(0)), GT(a, Int(0))]) == (False, None)
+
+def test_counterexample_cache_unsat_subset():
+    cache = CounterexampleCache()
+    cache.store([GT(a, Int(0)), LT(a, Int(0))], None)
+    assert cache.lookup([GT(a, Int(0)), LT(a, Int(0)), GT(b, Int(0))]) == (False, None)
+
+def test_counterexample_cache_model_of_superset():
+    cache = CounterexampleCache()
+    model = CachedModel({a: Int(5), b: Int(-1)})
+    cache.store([GT(a, Int(0)), LT(b, Int(0))], model)
+    assert cache.lookup([GT(a, Int(0))]) == (True, model)
+
+def test_counterexample_cache_reuses_models():
+    cache = CounterexampleCache()
+    model = CachedModel({a: Int(5), b: Int(-1)})
+    cache.store([GT(a, Int(0))], model)
+    assert cache.lookup([GT(a, Int(0)), LT(a, Int(10))]) == (True, model)
+    assert cache.lookup([GT(a, Int(0)), GT(a, Int(10))]) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_caches_keep_the_paths():
+    for example in ["elseif", "binary_search", "cseppento1", "maxtest", "whileloop"]:
+        plain = returns(engine(example).explore(30))
+        cached = engine(example, cache_size=16, cex_cache_size=16)
+        assert returns(cached.explore(30)) == plain, example
@@ -0,0 +1,39 @@
+# Copyright: see copyright.txt
+
+import pytest
+
+from helpers import engine, returns
+
+class Killed(Exception):
+    pass
+
+def test_resume(tmp_path):
+    journal = str(tmp_path / "journal")
+    first = engine("elseif")
+    first.checkpoint_to(journal, 0)
+    first.explore(4)
+
+    second = engine("elseif")
+    second.resume_from(journal)
+    second.checkpoint_to(journal, 0)
+    assert returns(second.explore()) == list(range(10))
+
+def test_resume_after_kill(tmp_path):
+    # an execution that never finished must be run again
+    journal = str(tmp_path / "journal")
+    first = engine("elseif")
+    first.checkpoint_to(journal, 0)
+    one_execution = first._one_execution
+    count = [0]
+    def killed_at_fourth(*args):
+        count[0] += 1
+        if count[0] == 4:
+            raise Killed()
+        one_execution(*args)
+    first._one_execution = killed_at_fourth
+    with pytest.raises(Killed):
+        first.explore()
+
+    second = engine("elseif")
+    second.resume_from(journal)
+    assert returns(second.explore()) == list(range(10))
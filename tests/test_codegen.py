@@ -0,0 +1,41 @@
+# Copyright: see copyright.txt
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pyexsmt import codegen
+
+from pysmt.shortcuts import *
+
+x = Symbol('x', INT)
+unknown = Symbol('Unknown', INT)
+
+# returns x when x > 0 and doesn't look at y
+summary = Ite(GT(x, Int(0)), x, unknown)
+
+def test_plain():
+    f = codegen.evaluator(summary, ["x", "y"])
+    assert f(3, 7) == 3
+    assert f(-1, 7) is None
+
+def test_vectorized_unused_argument():
+    try:
+        import numpy as np
+    except ImportError:
+        return
+    f = codegen.evaluator(summary, ["x", "y"], vectorized=True)
+    # x is a scalar, y an array the summary ignores: the result still has
+    # the shape of y
+    out = f(3, np.arange(4))
+    assert out.shape == (4,)
+    assert list(out) == [3, 3, 3, 3]
+    out = f(np.array([-1, 2]), np.zeros((3, 1)))
+    assert out.shape == (3, 2)
+    assert out.mask.tolist() == [[True, False]] * 3
+
+if __name__ == "__main__":
+    test_plain()
+    test_vectorized_unused_argument()
+    print("OK")
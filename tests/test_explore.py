@@ -0,0 +1,38 @@
+# Copyright: see copyright.txt
+
+import os
+import time
+
+from helpers import ROOT, engine, load, returns
+
+from pyexsmt.parallel import ParallelExplorationEngine
+
+EXAMPLES = ["elseif", "binary_search", "cseppento1", "maxtest", "many_branches", "tuplecmp"]
+
+def test_incremental_keeps_the_paths():
+    for example in EXAMPLES:
+        plain = returns(engine(example).explore(30))
+        assert returns(engine(example, incremental=True).explore(30)) == plain, example
+
+def test_time_budget_stops_inside_an_execution(tmp_path):
+    target = tmp_path / "budget_loop.py"
+    target.write_text("def budget_loop(n):\n"
+                      "    for i in range(10 ** 7):\n"
+                      "        if n == -1 - i:\n"
+                      "            return i\n"
+                      "    return -1\n")
+    loaded = load(str(target))
+    slow = engine(loaded)
+    start = time.time()
+    result = slow.explore(time_budget=0.5)
+    assert time.time() - start < 5
+    assert result.timed_out
+    # the execution that was cut short isn't recorded
+    assert result.num_executions == 0
+
+def test_parallel_iteration_yields_every_path():
+    loaded = load("elseif")
+    target = (os.path.join(ROOT, "examples", "elseif.py"), "", None, "int", [])
+    parallel = ParallelExplorationEngine(loaded.create_invocation(), target, jobs=2)
+    values = [execution.value for execution in parallel.explore_iter()]
+    assert sorted(values) == list(range(10))
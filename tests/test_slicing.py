@@ -0,0 +1,32 @@
+# Copyright: see copyright.txt
+
+from helpers import engine, returns
+
+from pyexsmt.predicate import Predicate
+from pyexsmt.slicing import independent_slice
+from pyexsmt.symbolic_types import SymbolicObject
+
+from pysmt.shortcuts import *
+
+x = Symbol("slice_test_x", INT)
+y = Symbol("slice_test_y", INT)
+z = Symbol("slice_test_z", INT)
+
+def _predicate(expr):
+    return Predicate(SymbolicObject(expr), True)
+
+def test_slice_keeps_dependent_asserts():
+    on_x = _predicate(GT(x, Int(0)))
+    on_y = _predicate(GT(y, Int(0)))
+    on_x_z = _predicate(LT(x, z))
+    on_z = _predicate(Equals(z, Int(3)))
+    query = _predicate(Equals(x, Int(1)))
+    # z is linked to x through x < z
+    assert independent_slice([on_x, on_y, on_x_z, on_z], query) == [on_x, on_x_z, on_z]
+    assert independent_slice([on_y], query) == []
+
+def test_slicing_keeps_the_paths():
+    for example in ["elseif", "binary_search", "cseppento1", "maxtest", "whileloop", "many_branches", "tuplecmp"]:
+        plain = returns(engine(example).explore(30))
+        sliced = engine(example, slicing=True)
+        assert returns(sliced.explore(30)) == plain, example
@@ -0,0 +1,60 @@
+# Copyright: see copyright.txt
+
+from helpers import engine, returns
+
+from pyexsmt.constraint import Constraint
+from pyexsmt.predicate import Predicate
+from pyexsmt.strategy import STRATEGIES, BFSStrategy, DFSStrategy, ShortestQueryStrategy, \
+                             RandomPathStrategy, UncoveredFirstStrategy
+from pyexsmt.symbolic_types import SymbolicObject
+
+from pysmt.shortcuts import *
+
+x = Symbol("strategy_test_x", INT)
+
+def _tree():
+    # root -> a -> b -> c, and root -> d
+    root = Constraint(None, None)
+    a = root.add_child(Predicate(SymbolicObject(GT(x, Int(0))), True))
+    b = a.add_child(Predicate(SymbolicObject(GT(x, Int(1))), True))
+    c = b.add_child(Predicate(SymbolicObject(GT(x, Int(2))), True))
+    d = root.add_child(Predicate(SymbolicObject(GT(x, Int(0))), False))
+    return root, [a, b, c, d]
+
+def _order(strategy, constraints):
+    for c in constraints:
+        strategy.add(c)
+    order = []
+    while len(strategy) > 0:
+        order.append(strategy.pop())
+    return order
+
+def test_bfs_and_dfs():
+    _, (a, b, c, d) = _tree()
+    assert _order(BFSStrategy(), [a, b, c, d]) == [a, b, c, d]
+    assert _order(DFSStrategy(), [a, b, c, d]) == [d, c, b, a]
+
+def test_shortest_query_first():
+    _, (a, b, c, d) = _tree()
+    assert _order(ShortestQueryStrategy(), [c, b, a, d]) == [a, d, b, c]
+
+def test_random_path_pops_everything_once():
+    _, constraints = _tree()
+    for seed in range(5):
+        order = _order(RandomPathStrategy(seed), constraints)
+        assert sorted(c.id for c in order) == sorted(c.id for c in constraints)
+
+def test_uncovered_first():
+    _, (a, b, c, d) = _tree()
+    strategy = UncoveredFirstStrategy()
+    # an execution took a, b and c: negating them leads to uncovered outcomes,
+    # but the opposite of d (x > 0) has been covered
+    strategy.executed(c)
+    order = _order(strategy, [d, a, b, c])
+    assert order[-1] is d
+
+def test_strategies_find_the_same_paths():
+    for example in ["elseif", "many_branches", "cseppento1"]:
+        plain = returns(engine(example).explore())
+        for name in sorted(STRATEGIES):
+            assert returns(engine(example, strategy=name).explore()) == plain, (example, name)
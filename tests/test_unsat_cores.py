@@ -0,0 +1,10 @@
+# Copyright: see copyright.txt
+
+from helpers import engine, returns
+
+def test_unsat_cores_prune_and_keep_the_paths():
+    for example in ["binary_search", "cseppento1", "maxtest", "whileloop"]:
+        plain = returns(engine(example).explore(30))
+        pruning = engine(example, unsat_cores=True)
+        assert returns(pruning.explore(30)) == plain, example
+        assert pruning.path.num_pruned > 0, example